@@ -1,55 +1,87 @@
 import sys
 from threading import Thread
-from src.event_listener import listen_for_events, fetch_and_process_events
-from src.models import Session, Event
-from src.config import EVENTS_CONFIG
+from src.event_listener import listen_for_events, backfill_events
+from src.event_subscriber import subscribe_for_events
+from src.async_pipeline import ingest_events
+from src.models import Session, Event, EventRollup, SyncState
+from src.config import EVENTS_CONFIG, LISTENER_CONFIG
 from src.logging_config import logger
 
 
+def get_start_block(session, event_name, event_config, requested_block):
+    """
+    Returns the block the backfill of an event starts from.
+
+    :param requested_block: Start block given on the command line, or None.
+    """
+    if requested_block is not None:
+        # Start Backfill from selected block
+        if requested_block > 0:
+            return requested_block
+        # Delete all events and start Backfill from first block
+        Event.delete_events(session, event_name)
+        SyncState.delete_state(session, event_name)
+        EventRollup.delete_rollups(session, event_name)
+        return event_config['start_block']
+
+    if not EventRollup.has_rollups(session, event_name):
+        # Build rollups for events stored before they existed
+        EventRollup.rebuild(session, event_name)
+
+    last_block_number = SyncState.get_last_block_number(session, event_name)
+    if last_block_number is None:
+        # No checkpoint yet, resume after the last stored event
+        last_block_number = Event.get_last_event_block_number(
+            session, event_name)
+
+    if last_block_number:
+        # Start Backfill from last Block
+        return last_block_number + 1
+    # Start Backfill from first block
+    return event_config['start_block']
+
+
 def main():
     try:
         session = Session()
+        requested_block = None
+        if len(sys.argv) > 1:
+            try:
+                requested_block = int(sys.argv[1])
+            except ValueError:
+                logger.error(
+                    "Invalid start block provided. Start block must be an integer. Usage: app.py 1525665"
+                )
+                return
+
+        active_events = {}
+        start_blocks = {}
         for event_name, event_config in EVENTS_CONFIG.items():
             if event_config['active']:
-                last_block = None
-                if len(sys.argv) > 1:
-                    try:
-                        start_block = int(sys.argv[1])
-                    except ValueError:
-                        logger.error(
-                            "Invalid start block provided. Start block must be an integer. Usage: app.py 1525665"
-                        )
-                        return
-                    # Start Backfill from selected block
-                    if start_block > 0:
-                        last_block = fetch_and_process_events(
-                            event_name, event_config, start_block)
-                    else:
-                        # Delete all events and start Backfill from first block
-                        Event.delete_events(session, event_name)
-                        last_block = fetch_and_process_events(
-                            event_name, event_config, event_config['start_block'])
-                else:
-                    last_block_number = Event.get_last_event_block_number(
-                        session, event_name)
-
-                    if last_block_number:
-                        # Start Backfill from last Block
-                        last_block = fetch_and_process_events(
-                            event_name, event_config, last_block_number + 1)
-                    else:
-                        # Start Backfill from first block
-                        last_block = fetch_and_process_events(
-                            event_name, event_config, event_config['start_block'])
-
-                logger.info(f"Backfill completed for {event_name}.")
-
-                event_listener_thread = Thread(target=listen_for_events, args=(
-                    last_block + 1, event_name, event_config))
-                event_listener_thread.start()
+                active_events[event_name] = event_config
+                start_blocks[event_name] = get_start_block(
+                    session, event_name, event_config, requested_block)
             else:
                 logger.info(f"Event {event_name} is not active. Skipping...")
 
+        if not active_events:
+            return
+
+        # A single scan covers every active event, logs already stored for
+        # events that are further ahead are skipped as duplicates
+        if LISTENER_CONFIG['mode'] == 'async':
+            # The asyncio pipeline backfills and then follows the head
+            ingest_events(min(start_blocks.values()), active_events)
+            return
+
+        last_block = backfill_events(active_events, min(start_blocks.values()))
+        logger.info(f"Backfill completed for {', '.join(active_events)}.")
+
+        listener = subscribe_for_events if LISTENER_CONFIG['mode'] == 'websocket' else listen_for_events
+        event_listener_thread = Thread(target=listener, args=(
+            last_block + 1, active_events))
+        event_listener_thread.start()
+
     except Exception as e:
         logger.error("An error occurred in the main function: %s",
                      e, exc_info=True)
@@ -1,12 +1,14 @@
 import logging
 from telegram import Bot, Update
 from telegram import error
-from telegram.ext import ApplicationBuilder, CommandHandler, CallbackContext
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, CallbackContext
 from telegram.constants import ParseMode
 from src.config import TELEGRAM_BOT_TOKEN
-from src.report_generators import get_report_generator
-from src.config import TELEGRAM_BOT_TOKEN, EVENTS_CONFIG
-from threading import Thread
+from src.report_cache import report_cache
+from src.report_scheduler import ReportScheduler
+from src.telegram_delivery import TelegramDeliveryQueue
+from src.telegram_webhook import run_webhook
+from src.config import TELEGRAM_BOT_TOKEN, EVENTS_CONFIG, STATS_COMMAND_CONFIG, TELEGRAM_WEBHOOK_CONFIG
 from src.logging_config import logger
 import asyncio
 import time
@@ -22,33 +24,136 @@ async def start(update: Update, context: CallbackContext) -> None:
     await update.message.reply_text('Hi! I am your TokensStatsTelegramBot.')
 
 
+def parse_window(window):
+    """
+    Parses a report window such as "24h", "7d" or "24".
+
+    :return: The window in hours, or None if it is invalid.
+    """
+    window = window.lower()
+    multiplier = 24 if window.endswith('d') else 1
+    try:
+        hours = int(window.rstrip('hd')) * multiplier
+    except ValueError:
+        return None
+    return hours if hours > 0 else None
+
+
+async def stats(update: Update, context: CallbackContext) -> None:
+    """
+    Reply to /stats <event> [window] with the report of an event. Reports are
+    served from the report cache and only the configured windows are allowed,
+    so repeated commands do not query the database.
+    """
+    active_events = {event_name.lower(): event_name for event_name, event_config in EVENTS_CONFIG.items()
+                     if event_config['active']}
+    usage = f"Usage: /stats <event> [window], events: {', '.join(active_events.values())}"
+    if not context.args or context.args[0].lower() not in active_events or len(context.args) > 2:
+        await update.message.reply_text(usage)
+        return
+    event_name = active_events[context.args[0].lower()]
+    hours = EVENTS_CONFIG[event_name]['report_interval_hours']
+    windows = set(STATS_COMMAND_CONFIG['windows_hours']) | {hours}
+    if len(context.args) == 2:
+        hours = parse_window(context.args[1])
+        if hours not in windows:
+            await update.message.reply_text(
+                f"Supported windows: {', '.join(f'{window}h' for window in sorted(windows))}")
+            return
+    try:
+        report = await report_cache.get_report_async(event_name, hours)
+    except Exception as e:
+        logger.telegram.error(
+            f"Failed to answer /stats for {event_name}: {e}", exc_info=True)
+        report = None
+    await update.message.reply_text(
+        report or f"No report available for {event_name}.", parse_mode=ParseMode.MARKDOWN)
+
+
+async def send_event_report(bot: Bot, event_name, event_config, delivery_queue=None) -> None:
+    """
+    Generate the report of an event and send it to its groups concurrently.
+    Raises if the report reached none of them.
+
+    :param delivery_queue: The running TelegramDeliveryQueue, a temporary one is used if None.
+    """
+    report = await report_cache.get_report_async(event_name)
+    if not report:
+        logger.telegram.info(
+            f"No report generated for {event_name}.")
+        return
+    group_ids = event_config['telegram_group_ids']
+    if delivery_queue is None:
+        async with TelegramDeliveryQueue(bot) as delivery_queue:
+            failed = await delivery_queue.broadcast(group_ids, report, parse_mode=ParseMode.MARKDOWN)
+    else:
+        failed = await delivery_queue.broadcast(group_ids, report, parse_mode=ParseMode.MARKDOWN)
+    if group_ids and len(failed) == len(group_ids):
+        # Raised so the scheduler retries a report that reached no group
+        raise RuntimeError(f"Report for {event_name} could not be sent to any group.")
+    # Groups that failed while others got the report are only logged, resending
+    # would repeat the report in the others
+    if failed:
+        logger.telegram.error(
+            f"Report for {event_name} could not be sent to groups {failed}.")
+    logger.telegram.info(
+        f"Report for {event_name} sent to {len(group_ids) - len(failed)} of {len(group_ids)} groups.")
+
+
 async def send_daily_report(bot: Bot) -> None:
     """Function to generate and send the daily report."""
-    for event_name, event_config in EVENTS_CONFIG.items():
-        if event_config['active']:
-            try:
-                report_generator = get_report_generator(event_name)
-                report = report_generator.generate_report()
-                if report:
-                    for telegram_group_id in event_config['telegram_group_ids']:
-                        await bot.send_message(chat_id=telegram_group_id,
-                                               text=report, parse_mode=ParseMode.MARKDOWN)
-                        logger.telegram.info(
-                            f"Report for {event_name} sent successfully to group {telegram_group_id}.")
-                else:
-                    logger.telegam.info(
-                        f"No report generated for {event_name}.")
-            except Exception as e:
-                logger.telegram.error(
-                    f"Failed to send report for {event_name}: {e}", exc_info=True)
+    active_events = [(event_name, event_config) for event_name, event_config in EVENTS_CONFIG.items()
+                     if event_config['active']]
+    async with TelegramDeliveryQueue(bot) as delivery_queue:
+        results = await asyncio.gather(
+            *(send_event_report(bot, event_name, event_config, delivery_queue)
+              for event_name, event_config in active_events),
+            return_exceptions=True)
+    for (event_name, _), result in zip(active_events, results):
+        if isinstance(result, Exception):
+            logger.telegram.error(
+                f"Failed to send report for {event_name}: {result}", exc_info=result)
+
+
+async def start_report_scheduler(application: Application) -> None:
+    """Start sending the reports of every event on its interval."""
+    delivery_queue = TelegramDeliveryQueue(application.bot)
+    delivery_queue.start()
+    application.bot_data['delivery_queue'] = delivery_queue
+    scheduler = ReportScheduler(
+        lambda event_name, event_config: send_event_report(
+            application.bot, event_name, event_config, delivery_queue))
+    # Not created with application.create_task, which would be awaited on stop
+    application.bot_data['report_scheduler'] = asyncio.create_task(scheduler.run())
+
+
+async def stop_report_scheduler(application: Application) -> None:
+    """Stop the report scheduler."""
+    task = application.bot_data.pop('report_scheduler', None)
+    if task:
+        task.cancel()
+    delivery_queue = application.bot_data.pop('delivery_queue', None)
+    if delivery_queue:
+        await delivery_queue.stop()
 
 
 def start_bot() -> None:
     """Start the bot."""
     try:
-        application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+        webhook = TELEGRAM_WEBHOOK_CONFIG['mode'] == 'webhook'
+        builder = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).post_init(
+            start_report_scheduler).post_stop(stop_report_scheduler).concurrent_updates(
+            TELEGRAM_WEBHOOK_CONFIG['concurrent_updates'])
+        if webhook:
+            # Updates are received by the aiohttp server, not by an Updater
+            builder = builder.updater(None)
+        application = builder.build()
         start_handler = CommandHandler('start', start)
         application.add_handler(start_handler)
+        application.add_handler(CommandHandler('stats', stats))
+        if webhook:
+            asyncio.run(run_webhook(application))
+            return
         application.run_polling()
         logger.telegram.info("Telegram bot started polling.")
     except Exception as e:
@@ -58,11 +163,5 @@ def start_bot() -> None:
 
 
 if __name__ == "__main__":
-
-    # Run the report sender in a separate thread
-    report_thread = Thread(target=asyncio.run, args=(send_daily_report(bot),))
-    report_thread.start()
-    logger.telegram.info("Report thread started.")
-
-    # Start the Telegram bot
+    # Start the Telegram bot, reports are sent by its scheduler
     start_bot()
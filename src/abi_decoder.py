@@ -0,0 +1,161 @@
+import json
+import re
+from decimal import Decimal
+from eth_abi import decode
+from hexbytes import HexBytes
+from web3 import Web3
+from .logging_config import logger
+
+WORD_SIZE = 32
+
+# Matches the intN and uintN type names
+INTEGER_TYPE = re.compile(r'^(u?)int(\d*)$')
+
+
+def word_decoder(abi_type):
+    """
+    Returns a function decoding one 32-byte word of a static ABI type, or None
+    if the type has to be decoded with eth_abi.
+
+    :param abi_type: The canonical ABI type, e.g. "uint256".
+    """
+    match = INTEGER_TYPE.match(abi_type)
+    if match:
+        signed = match.group(1) == ''
+        bits = int(match.group(2) or 256)
+
+        def decode_integer(word):
+            value = int.from_bytes(word, 'big', signed=signed)
+            if signed:
+                in_range = -(1 << (bits - 1)) <= value < (1 << (bits - 1))
+            else:
+                in_range = value >> bits == 0
+            if not in_range:
+                raise ValueError(f"Value {value} out of range for {abi_type}")
+            return value
+        return decode_integer
+    if abi_type == 'bool':
+        def decode_bool(word):
+            value = int.from_bytes(word, 'big')
+            if value > 1:
+                raise ValueError(f"Value {value} out of range for bool")
+            return bool(value)
+        return decode_bool
+    if abi_type == 'address':
+        def decode_address(word):
+            if any(word[:12]):
+                raise ValueError("Address word has non-zero padding")
+            return Web3.to_checksum_address(word[12:])
+        return decode_address
+    return None
+
+
+class BatchDecoder:
+    """
+    Decodes the data of a page of logs sharing one ABI layout. Layouts made
+    only of single-word static types are decoded by slicing the 32-byte words
+    directly, anything else falls back to eth_abi.
+    """
+
+    def __init__(self, types):
+        self.types = list(types)
+        word_decoders = [word_decoder(abi_type) for abi_type in self.types]
+        self.word_decoders = word_decoders if all(word_decoders) else None
+        self.size = WORD_SIZE * len(self.types)
+
+    def decode(self, payloads):
+        """
+        Decodes several ABI payloads.
+
+        :param payloads: List of payloads as bytes or hex strings.
+        :return: List of decoded value tuples, None for payloads that failed to decode.
+        """
+        return [self.decode_one(payload) for payload in payloads]
+
+    def decode_one(self, payload):
+        """Decodes one ABI payload, returning None if it is malformed."""
+        try:
+            payload = bytes(HexBytes(payload))
+            if self.word_decoders is None:
+                return decode(self.types, payload)
+            # Trailing bytes are ignored, as eth_abi does
+            if len(payload) < self.size:
+                raise ValueError(
+                    f"Expected {self.size} bytes of {self.types} data, got {len(payload)}")
+            return tuple(decode_word(payload[offset:offset + WORD_SIZE])
+                         for decode_word, offset in zip(self.word_decoders, range(0, self.size, WORD_SIZE)))
+        except Exception as e:
+            logger.error(f"Error decoding {self.types} payload: {e}", exc_info=True)
+            return None
+
+
+def scale_amount(value, decimals=18):
+    """
+    Converts an integer token amount to units without rounding.
+
+    :param value: The raw integer amount, e.g. in wei.
+    :param decimals: The number of decimals of the token.
+    :return: The amount as an exact Decimal.
+    """
+    return Decimal(value).scaleb(-decimals)
+
+
+class EventDecoder:
+    """
+    Decoder of one event signature compiled from its ABI. Indexed arguments
+    are read from the log topics, the others from the log data with a
+    BatchDecoder.
+    """
+
+    def __init__(self, event_abi):
+        self.name = event_abi['name']
+        self.inputs = event_abi['inputs']
+        self.signature = f"{self.name}({','.join(arg['type'] for arg in self.inputs)})"
+        self.topic0 = Web3.keccak(text=self.signature).hex().lower()
+        self.indexed = [(index, arg['name'], word_decoder(arg['type']))
+                        for index, arg in enumerate(arg for arg in self.inputs if arg['indexed'])]
+        self.data_names = [arg['name'] for arg in self.inputs if not arg['indexed']]
+        self.data_decoder = BatchDecoder(arg['type'] for arg in self.inputs if not arg['indexed'])
+
+    @classmethod
+    def from_abi(cls, abi, topic0):
+        """
+        Compiles the decoder of the event in an ABI whose signature hashes to topic0.
+
+        :param abi: The contract ABI as a JSON string or a list.
+        :param topic0: The event signature hash.
+        """
+        if isinstance(abi, str):
+            abi = json.loads(abi)
+        for entry in abi:
+            if entry.get('type') == 'event' and not entry.get('anonymous'):
+                decoder = cls(entry)
+                if decoder.topic0 == topic0.lower():
+                    return decoder
+        raise ValueError(f"No event with topic {topic0} in ABI")
+
+    def decode(self, logs):
+        """
+        Decodes the arguments of a page of logs.
+
+        :param logs: List of raw logs of this event.
+        :return: List of dictionaries of argument name to value in ABI order,
+            None for logs that failed to decode.
+        """
+        payloads = self.data_decoder.decode([log['data'] for log in logs])
+        decoded = []
+        for log, values in zip(logs, payloads):
+            if values is None:
+                decoded.append(None)
+                continue
+            try:
+                arguments = dict(zip(self.data_names, values))
+                for index, name, decode_word in self.indexed:
+                    topic = bytes(HexBytes(log['topics'][index + 1]))
+                    # Dynamic indexed arguments are only available as their hash
+                    arguments[name] = decode_word(topic) if decode_word else '0x' + topic.hex()
+                decoded.append({arg['name']: arguments[arg['name']] for arg in self.inputs})
+            except Exception as e:
+                logger.error(f"Error decoding {self.signature} topics: {e}", exc_info=True)
+                decoded.append(None)
+        return decoded
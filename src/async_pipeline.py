@@ -0,0 +1,218 @@
+import asyncio
+import time
+from .config import LISTENER_CONFIG
+from .logging_config import logger
+from .backfill import AdaptiveWindow, is_range_limit_error
+from .event_parser import get_event_parser
+from .event_listener import (build_log_filter, route_logs, confirmed_block, rollback_events,
+                             save_windows, HeadTracker, BlockHashWindow)
+from .rpc import create_async_web3, open_async_session
+
+# Marks the end of the stream on a pipeline queue
+STOP = None
+
+
+def ingest_events(start_block, events_config):
+    """Live listener that backfills and follows the chain head with the asyncio pipeline."""
+    asyncio.run(run_ingestion(start_block, events_config))
+
+
+async def run_ingestion(start_block, events_config, async_w3=None):
+    """
+    Runs the asyncio pipeline for ever, restarting it after the last stored
+    block when it fails. Can be scheduled as a task on an existing event loop.
+    """
+    pipeline = IngestionPipeline(events_config, async_w3)
+    last_block = start_block - 1
+    try:
+        while True:
+            last_block = await pipeline.run(last_block + 1)
+            await asyncio.sleep(LISTENER_CONFIG['reconnect_seconds'])
+    finally:
+        await pipeline.close()
+
+
+class IngestionPipeline:
+    """
+    Asyncio ingestion pipeline with three stages connected by bounded queues:
+    fetching logs in adaptive block windows, routing and enriching them with
+    concurrent RPC calls, and writing them to the database in block order. A
+    full queue blocks the stage before it, so a slow stage throttles the
+    pipeline instead of buffering logs in memory.
+    """
+
+    def __init__(self, events_config, async_w3=None, queue_size=None):
+        self.events_config = events_config
+        self.async_w3 = async_w3 or create_async_web3()
+        self.queue_size = queue_size or LISTENER_CONFIG['queue_size']
+        self.last_block = None
+        # aiohttp session of the provider, opened by the first run and reused on restarts
+        self.session = None
+
+    async def run(self, from_block, to_block=None):
+        """
+        Ingests events from a block.
+
+        :param from_block: First block to ingest.
+        :param to_block: Last block to ingest, or None to follow the chain head.
+        :return: The last block that was fully stored.
+        """
+        event_names = ', '.join(self.events_config)
+        self.last_block = from_block - 1
+        if self.session is None:
+            self.session = await open_async_session(self.async_w3)
+        logs_queue = asyncio.Queue(self.queue_size)
+        parsed_queue = asyncio.Queue(self.queue_size)
+        stages = [
+            asyncio.create_task(self.fetch_stage(from_block, to_block, logs_queue)),
+            asyncio.create_task(self.enrich_stage(logs_queue, parsed_queue)),
+            asyncio.create_task(self.write_stage(parsed_queue)),
+        ]
+        try:
+            done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+            for stage in done:
+                stage.result()
+        except Exception as e:
+            logger.error(
+                f"Error in {event_names} ingestion pipeline: {e}", exc_info=True)
+        finally:
+            for stage in stages:
+                stage.cancel()
+            # Cancel the enrichment of windows that will not be written
+            while not parsed_queue.empty():
+                item = parsed_queue.get_nowait()
+                if item is not STOP and item[0] == 'window':
+                    item[2].cancel()
+        return self.last_block
+
+    async def close(self):
+        """Closes the aiohttp session of the provider."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def fetch_stage(self, from_block, to_block, logs_queue):
+        """
+        Fetches the logs of every event in adaptive block windows. When
+        following the head, new confirmed blocks are polled when the next block
+        is expected and the hash of the last fetched block is verified first, a
+        reorganization queues a rollback to the fork block.
+        """
+        event_names = ', '.join(self.events_config)
+        log_filter = build_log_filter(self.events_config)
+        window = AdaptiveWindow()
+        head_tracker = HeadTracker()
+        block_hashes = BlockHashWindow()
+        next_block = from_block
+        while True:
+            try:
+                if to_block is None:
+                    head = head_tracker.update(await self.async_w3.eth.block_number)
+                    target_block = confirmed_block(self.events_config, head)
+                    fork_block = await self.find_fork(block_hashes)
+                    if fork_block is not None:
+                        logger.warning(
+                            f"Chain reorganization detected, re-ingesting from block {fork_block + 1}")
+                        await logs_queue.put(('rollback', fork_block))
+                        next_block = min(next_block, fork_block + 1)
+                else:
+                    target_block = to_block
+
+                poll_start = next_block
+                while next_block <= target_block:
+                    window_start, window_end = window.next_range(next_block, target_block)
+                    started_at = time.monotonic()
+                    try:
+                        logs = await self.async_w3.eth.get_logs({
+                            'fromBlock': window_start,
+                            'toBlock': window_end,
+                            **log_filter
+                        })
+                    except Exception as e:
+                        if is_range_limit_error(e) and window.failed():
+                            logger.warning(
+                                f"Range {window_start}-{window_end} rejected for {event_names}, retrying with {window.size} blocks: {e}")
+                            continue
+                        raise
+                    window.succeeded(time.monotonic() - started_at)
+                    logger.info(
+                        f"Total {event_names} Events Found in blocks {window_start}-{window_end}: {len(logs)}")
+                    # Waits while the enrich stage is behind
+                    await logs_queue.put(('window', window_end, logs))
+                    next_block = window_end + 1
+
+                if to_block is not None:
+                    break
+                if next_block > poll_start:
+                    block = await self.async_w3.eth.get_block(next_block - 1)
+                    block_hashes.record(next_block - 1, block['hash'])
+            except Exception as e:
+                if to_block is not None:
+                    raise
+                logger.error(
+                    f"Error polling {event_names} events: {e}", exc_info=True)
+            await asyncio.sleep(head_tracker.seconds_until_next_block())
+        await logs_queue.put(STOP)
+
+    async def find_fork(self, block_hashes):
+        """
+        Returns the last block still on the canonical chain if the last fetched
+        block was reorganized, None otherwise.
+        """
+        if not block_hashes.hashes:
+            return None
+        newest_block = next(reversed(block_hashes.hashes))
+        block = await self.async_w3.eth.get_block(newest_block)
+        if block['hash'] == block_hashes.hashes[newest_block]:
+            return None
+        # Walk back through the older hashes, only needed after a reorganization
+        block_numbers = list(block_hashes.hashes)
+        blocks = await asyncio.gather(
+            *(self.async_w3.eth.get_block(block_number) for block_number in block_numbers))
+        hashes = {block_number: block['hash'] for block_number, block in zip(block_numbers, blocks)}
+        return block_hashes.find_fork(hashes.get)
+
+    async def enrich_stage(self, logs_queue, parsed_queue):
+        """
+        Routes each window of logs to its events and starts enriching it. The
+        enrichment of several windows runs concurrently, the bounded queue
+        limits how many are in flight ahead of the writer.
+        """
+        while True:
+            item = await logs_queue.get()
+            if item is STOP:
+                await parsed_queue.put(STOP)
+                return
+            if item[0] == 'window':
+                _, window_end, logs = item
+                item = ('window', window_end, asyncio.create_task(
+                    self.parse_window(route_logs(self.events_config, logs))))
+            await parsed_queue.put(item)
+
+    async def parse_window(self, routed_logs):
+        """Parses the routed logs of every event of a window concurrently."""
+        event_names = list(routed_logs)
+        parsed_events = await asyncio.gather(*(
+            get_event_parser(event_name).parse_events_async(
+                routed_logs[event_name], self.events_config[event_name], self.async_w3)
+            for event_name in event_names))
+        return dict(zip(event_names, parsed_events))
+
+    async def write_stage(self, parsed_queue):
+        """
+        Stores each window and moves the sync checkpoints in block order, and
+        applies queued rollbacks between the windows around them.
+        """
+        while True:
+            item = await parsed_queue.get()
+            if item is STOP:
+                return self.last_block
+            if item[0] == 'rollback':
+                _, fork_block = item
+                await asyncio.to_thread(rollback_events, self.events_config, fork_block)
+                self.last_block = min(self.last_block, fork_block)
+                continue
+            _, window_end, parsing = item
+            parsed_events_by_name = await parsing
+            await asyncio.to_thread(save_windows, parsed_events_by_name, window_end)
+            self.last_block = window_end
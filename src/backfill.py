@@ -0,0 +1,84 @@
+import requests
+from aiohttp import ClientConnectionError
+from threading import Lock
+from .config import BACKFILL_CONFIG
+from .rpc import RATE_LIMIT_ERRORS, RetryableRPCError
+
+# Fragments of provider error messages that mean the requested block range was
+# too large (too many logs, response size cap or a request that timed out).
+RANGE_LIMIT_ERRORS = (
+    "too many results",
+    "more than 10000 results",
+    "query returned more than",
+    "response size exceeded",
+    "block range",
+    "limit exceeded",
+    "timeout",
+    "timed out",
+)
+
+
+def is_range_limit_error(error):
+    """
+    Checks whether a provider error means the block range should be shrunk.
+
+    :param error: The exception raised by the provider.
+    :return: True if retrying with a smaller window may succeed.
+    """
+    if isinstance(error, (requests.ConnectionError, ClientConnectionError)):
+        # Includes connect timeouts, the endpoint is unreachable whatever the range
+        return False
+    if isinstance(error, RetryableRPCError):
+        # Throttled or failing endpoint, a smaller range would not help
+        return False
+    message = str(error).lower()
+    if any(fragment in message for fragment in RATE_LIMIT_ERRORS):
+        # "Rate limit exceeded" would otherwise match "limit exceeded"
+        return False
+    if isinstance(error, TimeoutError):
+        return True
+    return any(fragment in message for fragment in RANGE_LIMIT_ERRORS)
+
+
+class AdaptiveWindow:
+    """
+    Block window size that grows after fast responses and shrinks when the
+    provider rejects a range or times out. It is safe to share between the
+    workers of a parallel scan, so every window learns from all responses.
+    """
+
+    def __init__(self, initial=None, minimum=None, maximum=None, target_seconds=None):
+        self.minimum = minimum or BACKFILL_CONFIG['min_window']
+        self.maximum = maximum or BACKFILL_CONFIG['max_window']
+        self.target_seconds = target_seconds or BACKFILL_CONFIG['target_seconds']
+        self.size = min(max(initial or BACKFILL_CONFIG['initial_window'],
+                            self.minimum), self.maximum)
+        self.lock = Lock()
+
+    def next_range(self, from_block, to_block):
+        """
+        Returns the inclusive block range of the next window.
+
+        :param from_block: First block of the window.
+        :param to_block: Last block of the whole scan.
+        """
+        with self.lock:
+            return from_block, min(from_block + self.size - 1, to_block)
+
+    def succeeded(self, elapsed_seconds):
+        """Doubles the window after a response faster than the target time."""
+        if elapsed_seconds < self.target_seconds:
+            with self.lock:
+                self.size = min(self.size * 2, self.maximum)
+
+    def failed(self):
+        """
+        Halves the window after a rejected range.
+
+        :return: False if the window is already at its minimum size.
+        """
+        with self.lock:
+            if self.size <= self.minimum:
+                return False
+            self.size = max(self.size // 2, self.minimum)
+            return True
@@ -9,10 +9,131 @@ load_dotenv()
 # Assign environment variables to Python variables
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 ETH_NODE_URL = os.getenv('ETH_NODE_URL')
+# Optional comma separated list of HTTP endpoints to fail over between, in order of preference
+ETH_NODE_URLS = [url.strip() for url in os.getenv(
+    'ETH_NODE_URLS', ETH_NODE_URL or '').split(',') if url.strip()]
+# Optional WebSocket endpoint of the node, required by the "websocket" listener mode
+ETH_WS_URL = os.getenv('ETH_WS_URL')
 PG_DB_URI = os.getenv('PG_DB_URI')
+# Optional public HTTPS base URL and secret token of the "webhook" bot mode,
+# a random secret token is used if none is set
+TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL')
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET')
 
 FILE_LOGGING = True
 
+# Backfill configuration: block window bounds used when scanning history, the
+# response time (seconds) under which the window is allowed to grow and the
+# number of workers fetching windows in parallel (1 disables the worker pool).
+# Logs of a window are parsed and stored in pages of at most "page_size" logs.
+BACKFILL_CONFIG = {
+    "initial_window": 2000,
+    "min_window": 10,
+    "max_window": 100000,
+    "target_seconds": 2.0,
+    "workers": 4,
+    "page_size": 500,
+}
+
+# Live listener configuration: "poll" queries eth_getLogs for each new block
+# range, "websocket" subscribes to logs over ETH_WS_URL and fills gaps with
+# eth_getLogs on reconnect, "async" runs backfill and polling in the asyncio
+# pipeline. The poller waits for the expected next block based on the observed
+# block time, bounded by the min/max poll seconds.
+LISTENER_CONFIG = {
+    "mode": "poll",
+    "reconnect_seconds": 5,
+    "initial_block_time": 12.0,
+    "min_poll_seconds": 1.0,
+    "max_poll_seconds": 30.0,
+    # Number of recent block hashes kept to detect chain reorganizations
+    "block_hash_window": 128,
+    # Capacity of the queues between the stages of the asyncio pipeline
+    "queue_size": 8,
+}
+
+# Maximum number of calls sent in a single JSON-RPC batch request
+RPC_BATCH_SIZE = 100
+
+# RPC client configuration: size of the keep-alive connection pool per endpoint,
+# request timeout (seconds) and exponential backoff applied to rate limited or
+# failing endpoints before a request gives up.
+RPC_CONFIG = {
+    "pool_size": 20,
+    "timeout": 30,
+    "max_retries": 5,
+    "backoff_seconds": 0.5,
+    "max_backoff_seconds": 30.0,
+}
+
+# Report scheduler of the bot: delay before a failed report is retried and the
+# longest sleep between schedule checks (seconds).
+REPORT_SCHEDULER_CONFIG = {
+    "retry_seconds": 300,
+    "max_sleep_seconds": 60,
+}
+
+# Rendered reports: seconds a report is reused, number of reports kept and
+# seconds between checks of the latest stored event, whose block is part of
+# the cache key.
+REPORT_CACHE_CONFIG = {
+    "ttl_seconds": 60,
+    "max_entries": 128,
+    "block_check_seconds": 5,
+}
+
+# Report windows in hours /stats can be asked for, besides each event's
+# report_interval_hours. Every window is a separate cached report.
+STATS_COMMAND_CONFIG = {
+    "windows_hours": [1, 4, 24, 168],
+}
+
+# Telegram bot updates: "polling" long-polls Telegram, "webhook" receives
+# updates on a local aiohttp server at listen:port/path, which a reverse proxy
+# exposes at TELEGRAM_WEBHOOK_URL. Up to "concurrent_updates" updates are
+# handled at once.
+TELEGRAM_WEBHOOK_CONFIG = {
+    "mode": "polling",
+    "listen": "127.0.0.1",
+    "port": 8080,
+    "path": "/telegram",
+    "url": TELEGRAM_WEBHOOK_URL,
+    "secret_token": TELEGRAM_WEBHOOK_SECRET,
+    "concurrent_updates": 16,
+}
+
+# Telegram delivery: concurrent senders, Telegram's global message rate and
+# minimum interval between messages to one chat (groups allow 20 per minute),
+# and the retries of failed messages with exponential backoff (seconds).
+TELEGRAM_DELIVERY_CONFIG = {
+    "workers": 10,
+    "messages_per_second": 25,
+    "chat_interval_seconds": 3.0,
+    "max_retries": 5,
+    "backoff_seconds": 1.0,
+}
+
+# Monthly range partitioning of the events table by timestamp. It only takes
+# effect when the events table is created, so enable it before the first run or
+# drop the table first. Partitions are created from "start" up to "months_ahead"
+# months past the current month on every startup, moving rows stored in the
+# default partition in the meantime into their month.
+EVENTS_PARTITION_CONFIG = {
+    "enabled": False,
+    "start": "2024-03-01",
+    "months_ahead": 3,
+}
+
+# Number of block timestamps kept in memory in front of the block_timestamps table
+BLOCK_TIMESTAMP_CACHE_SIZE = 10000
+
+# Wallet balance snapshots: balances of blocks younger than "live_seconds" may
+# still be reorganized and are cached for "ttl_seconds", older ones are kept.
+BALANCE_CACHE_CONFIG = {
+    "ttl_seconds": 60,
+    "live_seconds": 1800,
+}
+
 # Events configuration
 EVENTS_CONFIG = {
     "TotalDistribution": {
@@ -23,8 +144,31 @@ EVENTS_CONFIG = {
         "contractName": "AIX",
         "report_interval_hours": 4,
         "topics": ["0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694"],
+        # Data fields the ABI arguments are stored under, integers are scaled by "decimals"
+        "fields": {
+            "inputAixAmount": "aix_processed",
+            "distributedAixAmount": "aix_distributed",
+            "swappedEthAmount": "eth_bought",
+            "distributedEthAmount": "eth_distributed",
+        },
+        "decimals": 18,
+        # Lookups added to each event: the transaction "sender" and its ETH "balance"
+        "enrich": {
+            "sender": "distributor_wallet",
+            "balance": "distributor_balance",
+        },
+        # Amounts stored unscaled in exact events table columns instead of the data
+        "columns": {
+            "aix_processed": "aixProcessed",
+            "aix_distributed": "aixDistributed",
+            "eth_bought": "ethBought",
+            "eth_distributed": "ethDistributed",
+            "distributor_balance": "distributorBalance",
+        },
         "telegram_group_ids": [288566859],
         "start_block": 19516698,
+        # Blocks to wait behind the head before logs are stored
+        "confirmations": 3,
     }
 }
 
@@ -1,42 +1,318 @@
 import logging
 from web3 import Web3
-from web3.middleware import geth_poa_middleware
 import time
-from .models import Session, Event
-from .config import ETH_NODE_URL, EVENTS_CONFIG
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .models import Session, Event, SyncState
+from .config import EVENTS_CONFIG, BACKFILL_CONFIG, LISTENER_CONFIG
 from datetime import datetime
 from .logging_config import logger
 from .event_parser import get_event_parser
-
-# Initialize web3 connection
-w3 = Web3(Web3.HTTPProvider(ETH_NODE_URL))
-w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+from .backfill import AdaptiveWindow, is_range_limit_error
+from .rpc import w3
 
 
 def fetch_and_process_events(event_name, event_config, from_block=0, to_block='latest'):
     """Fetch and process events from the specified contract."""
+    return fetch_and_process_all_events({event_name: event_config}, from_block, to_block)
+
+
+def fetch_and_process_all_events(events_config, from_block=0, to_block='latest'):
+    """
+    Fetch and process the events of several contracts with one eth_getLogs
+    query per block window, routing each log to the parser of its event.
+
+    The range is scanned in adaptive block windows and each finished window is
+    checkpointed, so a failure only loses the window that was in flight.
+
+    :param events_config: Dictionary of event name to event configuration.
+    :return: The last block that was fully processed.
+    """
+    event_names = ', '.join(events_config)
+    last_processed_block = from_block - 1
     try:
-        # contract = w3.eth.contract(address=event_config['address'], abi=event_config['abi'])
-        event_filter = w3.eth.filter({
-            'fromBlock': from_block,
-            'toBlock': to_block,
-            'address': event_config['address'],
-            'topics': event_config['topics']
-        })
-        events = event_filter.get_all_entries()
-        logger.info(f"Total {event_name} Events Found: {len(events)}")
-
-        for index, event in enumerate(events):
-            parser = get_event_parser(event_name)
-            parsed_event = parser.parse_event_data(event, event_config)
-            logger.info(
-                f"\n [{index}/{len(events)}] Parsed Event: \n {parsed_event}\n")
-            save_event_in_db(event_name, parsed_event)
+        if to_block == 'latest':
+            to_block = confirmed_block(events_config, w3.eth.block_number)
+        log_filter = build_log_filter(events_config)
 
-        return events[-1]['blockNumber'] if len(events) > 0 else from_block
+        for logs, block_number in iter_log_pages(events_config, log_filter, from_block, to_block):
+            save_windows(parse_routed_logs(
+                events_config, route_logs(events_config, logs)), block_number)
+            last_processed_block = block_number
+
+        return last_processed_block
     except Exception as e:
-        logger.error(f"Error fetching {event_name} events: {e}", exc_info=True)
-        return from_block
+        logger.error(
+            f"Error fetching {event_names} events: {e}", exc_info=True)
+        return last_processed_block
+
+
+def iter_log_pages(events_config, log_filter, from_block, to_block, page_size=None):
+    """
+    Lazily fetches the logs of a block range in adaptive block windows and
+    yields them in pages of at most page_size logs, so only one window is held
+    in memory however large the range is.
+
+    :param page_size: Maximum number of logs per page.
+    :return: Generator of (logs, block_number) tuples, where block_number is the
+        last block whose logs have all been yielded.
+    """
+    event_names = ', '.join(events_config)
+    page_size = page_size or BACKFILL_CONFIG['page_size']
+    window = AdaptiveWindow()
+    next_block = from_block
+    while next_block <= to_block:
+        window_start, window_end = window.next_range(next_block, to_block)
+        started_at = time.monotonic()
+        try:
+            logs = fetch_logs(log_filter, window_start, window_end)
+        except Exception as e:
+            if is_range_limit_error(e) and window.failed():
+                logger.warning(
+                    f"Range {window_start}-{window_end} rejected for {event_names}, retrying with {window.size} blocks: {e}")
+                continue
+            raise
+        window.succeeded(time.monotonic() - started_at)
+        logger.info(
+            f"Total {event_names} Events Found in blocks {window_start}-{window_end}: {len(logs)}")
+
+        yield from paginate_logs(logs, window_end, page_size)
+        # Release the window before the next one is fetched
+        del logs
+        next_block = window_end + 1
+
+
+def paginate_logs(logs, window_end, page_size):
+    """
+    Splits the logs of a block window into pages of at most page_size logs.
+
+    :return: Generator of (logs, block_number) tuples, where block_number is the
+        last block whose logs have all been yielded.
+    """
+    for offset in range(0, len(logs), page_size):
+        page = logs[offset:offset + page_size]
+        if offset + page_size < len(logs):
+            # Logs of the block at the page boundary may continue on the next page
+            yield page, logs[offset + page_size]['blockNumber'] - 1
+        else:
+            yield page, window_end
+    if not logs:
+        yield [], window_end
+
+
+def confirmed_block(events_config, head):
+    """
+    Returns the newest block that has the confirmation depth required by every
+    event, so one query range suits all of them.
+    """
+    confirmations = max((config.get('confirmations', 0) for config in events_config.values()), default=0)
+    return head - confirmations
+
+
+def rollback_events(events_config, block_number):
+    """Delete the events of every event above a block that left the canonical chain."""
+    session = Session()
+    try:
+        for event_name in events_config:
+            Event.rollback_after_block(session, event_name, block_number)
+    finally:
+        session.close()
+
+
+def get_block_hash(block_number):
+    """Fetch the hash of a block from the node."""
+    return w3.eth.get_block(block_number)['hash']
+
+
+def build_log_filter(events_config):
+    """
+    Combine the addresses and event signatures of several events into a single
+    eth_getLogs filter. Further topic positions are matched by route_logs.
+    """
+    return {
+        'address': list(dict.fromkeys(config['address'] for config in events_config.values())),
+        'topics': [list(dict.fromkeys(config['topics'][0] for config in events_config.values()))],
+    }
+
+
+def route_logs(events_config, logs):
+    """
+    Assign each log to the event whose address and topics it matches.
+
+    :return: Dictionary of event name to the list of its logs.
+    """
+    routes = {}
+    for event_name, event_config in events_config.items():
+        routes.setdefault((event_config['address'].lower(), event_config['topics'][0].lower()), []).append(
+            (event_name, event_config['topics'][1:]))
+
+    routed_logs = {event_name: [] for event_name in events_config}
+    for log in logs:
+        topics = [Web3.to_hex(topic).lower() for topic in log['topics']]
+        for event_name, extra_topics in routes.get((log['address'].lower(), topics[0]), []):
+            if all(topic is None or (index + 1 < len(topics) and topics[index + 1] == topic.lower())
+                   for index, topic in enumerate(extra_topics)):
+                routed_logs[event_name].append(log)
+                break
+    return routed_logs
+
+
+def parse_routed_logs(events_config, routed_logs):
+    """Parse the routed logs of every event."""
+    return {event_name: parse_events(event_name, events_config[event_name], logs)
+            for event_name, logs in routed_logs.items()}
+
+
+def save_windows(parsed_events_by_name, block_number):
+    """Store the parsed events of every event and checkpoint each of them."""
+    for event_name, parsed_events in parsed_events_by_name.items():
+        save_window(event_name, parsed_events, block_number)
+
+
+def fetch_logs(log_filter, from_block, to_block):
+    """Fetch the raw logs matching a filter for an inclusive block range."""
+    return w3.eth.get_logs({
+        'fromBlock': from_block,
+        'toBlock': to_block,
+        **log_filter
+    })
+
+
+def parse_events(event_name, event_config, events):
+    """Parse raw logs into dictionaries ready for database insertion."""
+    parser = get_event_parser(event_name)
+    parsed_events = parser.parse_events(events, event_config)
+    for index, parsed_event in enumerate(parsed_events):
+        logger.info(
+            f"\n [{index}/{len(parsed_events)}] Parsed Event: \n {parsed_event}\n")
+    return parsed_events
+
+
+def save_window(event_name, parsed_events, block_number):
+    """
+    Store a page of parsed events with a single insert and move the sync
+    checkpoint to the end of its window in the same transaction.
+
+    Events whose payload cannot be decoded (None) are skipped. Any other event
+    that failed to parse (an empty dictionary) fails the page instead, so the
+    checkpoint does not move past it and the window is fetched again.
+
+    :return: Tuple of (inserted, skipped) row counts.
+    """
+    failed = sum(1 for event in parsed_events if event is not None and not event)
+    if failed:
+        raise ValueError(
+            f"{failed} {event_name} events failed to parse, not checkpointing block {block_number}")
+    valid_events = [event for event in parsed_events if event]
+    if len(valid_events) < len(parsed_events):
+        logger.error(
+            f"{len(parsed_events) - len(valid_events)} {event_name} events could not be decoded and were not saved.")
+    session = Session()
+    try:
+        inserted, skipped = Event.insert_events(
+            session, event_name, valid_events, commit=False)
+        SyncState.set_last_block_number(
+            session, event_name, block_number, commit=False)
+        session.commit()
+        return inserted, skipped
+    finally:
+        session.close()
+
+
+def fetch_window(events_config, log_filter, from_block, to_block, window, page_size=None):
+    """
+    Fetch, route and parse the logs of one block window in pages. A range the
+    provider rejects as too large is fetched in parts of the shrunk shared
+    window, and every response resizes the window used for the next ranges.
+
+    :param window: The AdaptiveWindow shared by the workers of the scan.
+    :return: List of (parsed events by name, block number) tuples in block order.
+    """
+    event_names = ', '.join(events_config)
+    page_size = page_size or BACKFILL_CONFIG['page_size']
+    logs = []
+    next_block = from_block
+    while next_block <= to_block:
+        part_start, part_end = window.next_range(next_block, to_block)
+        started_at = time.monotonic()
+        try:
+            logs.extend(fetch_logs(log_filter, part_start, part_end))
+        except Exception as e:
+            # Another worker may already have shrunk the window below this range
+            if is_range_limit_error(e) and (window.failed() or part_end - part_start + 1 > window.size):
+                logger.warning(
+                    f"Range {part_start}-{part_end} rejected for {event_names}, retrying with {window.size} blocks: {e}")
+                continue
+            raise
+        window.succeeded(time.monotonic() - started_at)
+        next_block = part_end + 1
+    return [(parse_routed_logs(events_config, route_logs(events_config, page)), block_number)
+            for page, block_number in paginate_logs(logs, to_block, page_size)]
+
+
+def parallel_fetch_and_process_events(events_config, from_block=0, to_block='latest', workers=None):
+    """
+    Fetch and process events with a pool of workers scanning disjoint block
+    windows. Window sizes come from one AdaptiveWindow shared by the workers.
+    Windows are written and checkpointed page by page in block order by the
+    calling thread, so a failure never leaves a gap behind the checkpoint.
+
+    :param events_config: Dictionary of event name to event configuration.
+    :return: The last block that was fully processed.
+    """
+    event_names = ', '.join(events_config)
+    workers = workers or BACKFILL_CONFIG['workers']
+    window = AdaptiveWindow()
+    last_processed_block = from_block - 1
+    try:
+        if to_block == 'latest':
+            to_block = confirmed_block(events_config, w3.eth.block_number)
+        log_filter = build_log_filter(events_config)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            try:
+                next_block = from_block
+                while next_block <= to_block:
+                    # Sized when submitted, so later windows use what earlier responses taught
+                    window_start, window_end = window.next_range(next_block, to_block)
+                    pending.append((window_end, executor.submit(
+                        fetch_window, events_config, log_filter, window_start, window_end, window)))
+                    next_block = window_end + 1
+                    # Keep a bounded number of windows in flight ahead of the writer
+                    if len(pending) >= workers * 2:
+                        last_processed_block = write_window(*pending.popleft())
+                while pending:
+                    last_processed_block = write_window(*pending.popleft())
+            except Exception:
+                for _, future in pending:
+                    future.cancel()
+                raise
+
+        return last_processed_block
+    except Exception as e:
+        logger.error(
+            f"Error fetching {event_names} events: {e}", exc_info=True)
+        return last_processed_block
+
+
+def write_window(window_end, future):
+    """Wait for a fetched window, store its pages and checkpoint each of them."""
+    pages = future.result()
+    for event_name in pages[0][0]:
+        logger.info(
+            f"Total {event_name} Events Found up to block {window_end}: "
+            f"{sum(len(parsed_events_by_name[event_name]) for parsed_events_by_name, _ in pages)}")
+    for parsed_events_by_name, block_number in pages:
+        save_windows(parsed_events_by_name, block_number)
+    return window_end
+
+
+def backfill_events(events_config, from_block):
+    """Backfill several events from a block, using the worker pool when configured."""
+    if BACKFILL_CONFIG['workers'] > 1:
+        return parallel_fetch_and_process_events(events_config, from_block)
+    return fetch_and_process_all_events(events_config, from_block)
 
 
 def save_event_in_db(event_name, event_data):
@@ -53,20 +329,121 @@ def save_event_in_db(event_name, event_data):
         session.close()
 
 
-def listen_for_events(start_block, event_name, event_config):
-    """Main listener loop for new events."""
-    try:
-        logger.info(
-            f"Starting event listener from specified block: {start_block}")
-        while True:
-            if event_config['active']:
-                last_block = fetch_and_process_events(
-                    event_name, event_config, from_block=start_block)
+class HeadTracker:
+    """
+    Tracks the chain head and estimates the block time, so the poller can sleep
+    until the next block is expected instead of polling on a fixed timer.
+    """
+
+    def __init__(self, block_time=None):
+        self.block_time = block_time or LISTENER_CONFIG['initial_block_time']
+        self.head = None
+        self.head_seen_at = None
+
+    def update(self, head, now=None):
+        """
+        Records the current head block and refines the block time estimate.
+
+        :param head: The latest block number reported by the node.
+        :return: The highest head seen so far.
+        """
+        now = time.monotonic() if now is None else now
+        if self.head is not None and head > self.head:
+            observed_block_time = (now - self.head_seen_at) / (head - self.head)
+            self.block_time = 0.8 * self.block_time + 0.2 * observed_block_time
+        if self.head is None or head > self.head:
+            self.head = head
+            self.head_seen_at = now
+        return self.head
+
+    def seconds_until_next_block(self, now=None):
+        """Returns how long to sleep before the next block is expected."""
+        now = time.monotonic() if now is None else now
+        wait = self.block_time
+        if self.head_seen_at is not None:
+            wait -= now - self.head_seen_at
+        return min(max(wait, LISTENER_CONFIG['min_poll_seconds']), LISTENER_CONFIG['max_poll_seconds'])
+
+
+class BlockHashWindow:
+    """
+    Hashes of recently processed blocks, used to detect chain reorganizations
+    below the confirmation depth.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or LISTENER_CONFIG['block_hash_window']
+        self.hashes = OrderedDict()
+
+    def record(self, block_number, block_hash):
+        """Remembers the hash of a processed block, dropping the oldest ones."""
+        newest_block = next(reversed(self.hashes), None)
+        self.hashes[block_number] = block_hash
+        if newest_block is not None and block_number < newest_block:
+            # Keep the blocks in order, find_fork walks them newest first
+            self.hashes = OrderedDict(sorted(self.hashes.items()))
+        while len(self.hashes) > self.size:
+            self.hashes.popitem(last=False)
+
+    def discard_after(self, block_number):
+        """Forgets the hashes of blocks above a block that was rolled back."""
+        for recorded_block in [recorded_block for recorded_block in self.hashes if recorded_block > block_number]:
+            del self.hashes[recorded_block]
+
+    def find_fork(self, get_hash):
+        """
+        Compares the remembered hashes with the node, newest first.
+
+        :param get_hash: Callable returning the current hash of a block number.
+        :return: None if the newest block is unchanged, otherwise the last block
+            that is still on the canonical chain. Changed blocks are forgotten.
+        """
+        if not self.hashes:
+            return None
+        newest_block = next(reversed(self.hashes))
+        for block_number in reversed(list(self.hashes)):
+            if get_hash(block_number) == self.hashes[block_number]:
+                return None if block_number == newest_block else block_number
+            del self.hashes[block_number]
+        # The reorganization is deeper than the window, roll back all of it
+        return block_number - 1
+
+
+def listen_for_events(start_block, events_config):
+    """
+    Main listener loop for new events. A single poller checks the head block
+    with eth_blockNumber and queries the logs of every active event only for
+    the confirmed blocks that arrived since the last poll. Before each query the
+    hash of the last processed block is verified, and events from blocks that
+    left the canonical chain are rolled back and fetched again.
+    """
+    logger.info(
+        f"Starting event listener for {', '.join(events_config)} from specified block: {start_block}")
+    head_tracker = HeadTracker()
+    block_hashes = BlockHashWindow()
+    while True:
+        try:
+            head = head_tracker.update(w3.eth.block_number)
+            active_events = {event_name: event_config for event_name, event_config in events_config.items()
+                             if event_config['active']}
+            to_block = confirmed_block(active_events, head)
+            if active_events and to_block >= start_block:
+                fork_block = block_hashes.find_fork(get_block_hash)
+                if fork_block is not None:
+                    logger.warning(
+                        f"Chain reorganization detected, re-ingesting from block {fork_block + 1}")
+                    rollback_events(active_events, fork_block)
+                    start_block = min(start_block, fork_block + 1)
+
+                last_block = fetch_and_process_all_events(
+                    active_events, from_block=start_block, to_block=to_block)
+                if last_block >= start_block:
+                    block_hashes.record(last_block, get_block_hash(last_block))
                 start_block = last_block + 1
-            time.sleep(10)
-    except Exception as e:
-        logger.error(f"Error in event listener loop: {e}", exc_info=True)
+        except Exception as e:
+            logger.error(f"Error in event listener loop: {e}", exc_info=True)
+        time.sleep(head_tracker.seconds_until_next_block())
 
 
 if __name__ == "__main__":
-    listen_for_events(start_block=19516698)
+    listen_for_events(19516698, EVENTS_CONFIG)
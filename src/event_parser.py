@@ -1,14 +1,264 @@
+import asyncio
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+import time
+from threading import Lock
 import json
 from .logging_config import logger
 from web3 import Web3
-from web3.middleware import geth_poa_middleware
-from eth_abi import decode
-from .config import ETH_NODE_URL
+from .config import BLOCK_TIMESTAMP_CACHE_SIZE, BALANCE_CACHE_CONFIG, EVENTS_CONFIG
+from .models import Session, BlockTimestamp
+from .rpc import w3, batch_request
+from .abi_decoder import EventDecoder, scale_amount
 from datetime import datetime
 
-w3 = Web3(Web3.HTTPProvider(ETH_NODE_URL))
-w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+class BlockTimestampCache:
+    """
+    Block number to timestamp cache with a bounded in-memory LRU tier in front
+    of the block_timestamps table. Blocks missing from both tiers are fetched
+    from the node and stored in both.
+    """
+
+    def __init__(self, max_size=BLOCK_TIMESTAMP_CACHE_SIZE):
+        self.max_size = max_size
+        self.timestamps = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, block_number):
+        """
+        Returns the Unix timestamp of a block.
+
+        :param block_number: The block number.
+        """
+        return self.get_many([block_number], fetch_block_timestamps)[block_number]
+
+    def get_many(self, block_numbers, fetch_missing):
+        """
+        Returns the Unix timestamps of several blocks.
+
+        :param block_numbers: The block numbers.
+        :param fetch_missing: Callable fetching a list of block numbers from the
+            node and returning a dictionary of block number to timestamp.
+        :return: Dictionary of block number to Unix timestamp.
+        """
+        timestamps, missing = self.lookup(block_numbers)
+        if missing:
+            fetched = fetch_missing(missing)
+            self.store(fetched)
+            timestamps.update(fetched)
+        return timestamps
+
+    def lookup(self, block_numbers):
+        """
+        Looks blocks up in the in-memory tier and then in the database.
+
+        :param block_numbers: The block numbers.
+        :return: Tuple of (dictionary of known timestamps, list of block numbers
+            that have to be fetched from the node).
+        """
+        timestamps = {}
+        with self.lock:
+            for block_number in block_numbers:
+                if block_number in self.timestamps:
+                    self.timestamps.move_to_end(block_number)
+                    timestamps[block_number] = self.timestamps[block_number]
+
+        missing = [number for number in block_numbers if number not in timestamps]
+        if missing:
+            session = Session()
+            try:
+                stored = BlockTimestamp.get_timestamps(session, missing)
+            finally:
+                session.close()
+            self.remember(stored)
+            timestamps.update(stored)
+            missing = [number for number in missing if number not in stored]
+        return timestamps, missing
+
+    def store(self, timestamps):
+        """Saves timestamps fetched from the node in both tiers."""
+        if not timestamps:
+            return
+        session = Session()
+        try:
+            BlockTimestamp.save_timestamps(session, timestamps)
+        finally:
+            session.close()
+        self.remember(timestamps)
+
+    def remember(self, timestamps):
+        """Adds timestamps to the in-memory tier, evicting the least recently used."""
+        with self.lock:
+            for block_number, timestamp in timestamps.items():
+                self.timestamps[block_number] = timestamp
+                self.timestamps.move_to_end(block_number)
+            while len(self.timestamps) > self.max_size:
+                self.timestamps.popitem(last=False)
+
+
+def fetch_block_timestamps(block_numbers):
+    """Fetches block timestamps from the node one block at a time."""
+    return {block_number: w3.eth.get_block(block_number)['timestamp']
+            for block_number in block_numbers}
+
+
+def batch_fetch_block_timestamps(block_numbers):
+    """Fetches block timestamps from the node with a JSON-RPC batch request."""
+    blocks = batch_request(
+        w3, [('eth_getBlockByNumber', [hex(block_number), False]) for block_number in block_numbers])
+    return {block_number: int(block['timestamp'], 16)
+            for block_number, block in zip(block_numbers, blocks)}
+
+
+block_timestamp_cache = BlockTimestampCache()
+
+
+# Fragments of node error messages that mean the state of a past block is not
+# available, because the node is not an archive node or has pruned it.
+ARCHIVE_UNAVAILABLE_ERRORS = (
+    "missing trie node",
+    "header not found",
+    "historical state",
+    "state is not available",
+    "state not available",
+    "pruned",
+)
+
+
+def is_archive_unavailable_error(error):
+    """
+    Checks whether a node error means balances at past blocks cannot be read.
+
+    :param error: The exception raised by the balance lookup.
+    :return: True if only the latest balance can be read.
+    """
+    message = str(error).lower()
+    return any(fragment in message for fragment in ARCHIVE_UNAVAILABLE_ERRORS)
+
+
+class BalanceSnapshotCache:
+    """
+    Wallet balances at the blocks of events, looked up once per wallet and
+    block. Balances of blocks older than the live window can no longer change
+    and are memoized for good, balances of recent blocks may still be
+    reorganized and expire after a TTL.
+    """
+
+    def __init__(self, ttl_seconds=None, live_seconds=None):
+        self.ttl_seconds = ttl_seconds or BALANCE_CACHE_CONFIG['ttl_seconds']
+        self.live_seconds = live_seconds or BALANCE_CACHE_CONFIG['live_seconds']
+        self.history = {}
+        self.live = {}
+        self.lock = Lock()
+
+    def get_many(self, keys, timestamps, fetch_missing):
+        """
+        Returns the balances of wallets at blocks. Latest balances are used
+        only if the node cannot serve the state of past blocks, any other
+        error is raised so the page is parsed again.
+
+        :param keys: List of (wallet, block number) tuples.
+        :param timestamps: Dictionary of block number to Unix timestamp.
+        :param fetch_missing: Callable fetching a list of (wallet, block
+            identifier) tuples from the node and returning a dictionary of
+            tuple to balance in wei.
+        :return: Dictionary of (wallet, block number) to balance in wei.
+        """
+        balances, missing = self.lookup(keys)
+        if missing:
+            try:
+                fetched = fetch_missing(missing)
+                self.store(fetched, timestamps)
+            except Exception as e:
+                if not is_archive_unavailable_error(e):
+                    raise
+                self.warn_latest(e)
+                latest = fetch_missing(self.latest_keys(missing))
+                fetched = self.store_latest(missing, latest)
+            balances.update(fetched)
+        return balances
+
+    async def get_many_async(self, keys, timestamps, fetch_missing):
+        """Async variant of get_many, fetch_missing is a coroutine function."""
+        balances, missing = self.lookup(keys)
+        if missing:
+            try:
+                fetched = await fetch_missing(missing)
+                self.store(fetched, timestamps)
+            except Exception as e:
+                if not is_archive_unavailable_error(e):
+                    raise
+                self.warn_latest(e)
+                latest = await fetch_missing(self.latest_keys(missing))
+                fetched = self.store_latest(missing, latest)
+            balances.update(fetched)
+        return balances
+
+    def lookup(self, keys):
+        """
+        Looks balances up in memory.
+
+        :return: Tuple of (dictionary of known balances, list of missing keys).
+        """
+        balances = {}
+        now = time.time()
+        with self.lock:
+            for key in keys:
+                if key in self.history:
+                    balances[key] = self.history[key]
+                elif key in self.live and self.live[key][1] > now:
+                    balances[key] = self.live[key][0]
+        return balances, list(dict.fromkeys(key for key in keys if key not in balances))
+
+    def store(self, balances, timestamps, permanent=True):
+        """
+        Remembers fetched balances.
+
+        :param timestamps: Dictionary of block number to Unix timestamp, blocks
+            without a timestamp are treated as live.
+        :param permanent: False for balances that were not read at their block.
+        """
+        now = time.time()
+        with self.lock:
+            self.live = {key: entry for key, entry in self.live.items() if entry[1] > now}
+            for (wallet, block_number), balance in balances.items():
+                block_timestamp = timestamps.get(block_number)
+                if permanent and block_timestamp is not None and now - block_timestamp > self.live_seconds:
+                    self.history[(wallet, block_number)] = balance
+                else:
+                    self.live[(wallet, block_number)] = (balance, now + self.ttl_seconds)
+
+    def warn_latest(self, error):
+        logger.warning(
+            f"Balances at event blocks are unavailable, using latest balances instead: {error}")
+
+    @staticmethod
+    def latest_keys(missing):
+        """Returns one latest balance key per wallet of the missing keys."""
+        return list(dict.fromkeys((wallet, 'latest') for wallet, _ in missing))
+
+    def store_latest(self, missing, latest):
+        """Assigns latest balances to the missing keys, they are only kept for the TTL."""
+        fetched = {(wallet, block_number): latest[(wallet, 'latest')]
+                   for wallet, block_number in missing}
+        self.store(fetched, {}, permanent=False)
+        return fetched
+
+
+def fetch_balances(keys):
+    """Fetches wallet balances at blocks from the node one at a time."""
+    return {(wallet, block): w3.eth.get_balance(wallet, block) for wallet, block in keys}
+
+
+def batch_fetch_balances(keys):
+    """Fetches wallet balances at blocks from the node with a JSON-RPC batch request."""
+    balances = batch_request(w3, [
+        ('eth_getBalance', [wallet, block if block == 'latest' else hex(block)]) for wallet, block in keys])
+    return {key: int(balance, 16) for key, balance in zip(keys, balances)}
+
+
+balance_cache = BalanceSnapshotCache()
 
 
 class EventParser(ABC):
@@ -20,93 +270,310 @@ class EventParser(ABC):
     @abstractmethod
     def parse_event_data(self, event, event_config):
         """
-        Parses the raw event data into a structured format.
+        Parses the raw event data into a structured format. Failures that a
+        retry may fix, such as RPC errors, are raised so the event is not
+        skipped.
 
         :param event_data: The raw event data.
-        :return: A dictionary representing the parsed data.
+        :return: A dictionary representing the parsed data, None if the payload
+            cannot be decoded.
         """
         pass
 
+    def parse_events(self, events, event_config):
+        """
+        Parses a page of raw events. Subclasses can override this method to
+        share RPC lookups across the page.
 
-class TotalDistributionParser(EventParser):
+        :param events: List of raw events.
+        :return: A list of dictionaries representing the parsed data, None for
+            payloads that cannot be decoded.
+        """
+        return [self.parse_event_data(event, event_config) for event in events]
+
+    async def parse_events_async(self, events, event_config, async_w3):
+        """
+        Parses a page of raw events from an asyncio pipeline. By default the
+        synchronous parse_events runs in a worker thread, subclasses can
+        override this method to enrich the page with concurrent async RPC calls.
+
+        :param events: List of raw events.
+        :param async_w3: AsyncWeb3 instance of the pipeline.
+        :return: A list of dictionaries representing the parsed data.
+        """
+        return await asyncio.to_thread(self.parse_events, events, event_config)
+
+
+class AbiEventParser(EventParser):
     """
-    Parser for TotalDistribution events.
+    Generic parser driven by an event configuration. The payload is decoded
+    with the decoder compiled from the configured ABI, and the enrichment
+    lookups are chosen by the "enrich" option:
+
+    - "sender": stores the transaction sender under the given data field.
+    - "balance": stores the sender balance at the event block under the given data field.
+
+    Arguments are renamed by the "fields" option. Fields listed in the
+    "columns" option are stored unscaled in typed events table columns, other
+    integer arguments are scaled by the "decimals" option. The block timestamp
+    is always looked up.
     """
 
+    def __init__(self, event_config, decoder=None):
+        self.name = event_config['db_name']
+        self.decoder = decoder or EventDecoder.from_abi(
+            event_config['abi'], event_config['topics'][0])
+        self.fields = event_config.get('fields', {})
+        self.decimals = event_config.get('decimals')
+        self.enrich = event_config.get('enrich', {})
+        self.columns = event_config.get('columns', {})
+        self.needs_sender = 'sender' in self.enrich or 'balance' in self.enrich
+
     def parse_event_data(self, event, event_config):
         """
-        Parses TotalDistribution event data.
+        Parses a single event with one lookup per enrichment.
 
         :param event_data: The raw event data.
         :return: A dictionary representing the parsed data.
         """
         try:
             logger.info(
-                f"\n Starting Decoding TotalDistribution envent data for TX: {event['transactionHash'].hex()} \n")
-            event_data = event['data']
-            inputAixAmount, distributedAixAmount, swappedEthAmount, distributedEthAmount = decode(
-                ["uint256", "uint256", "uint256", "uint256"], event_data)
-
-            # Convert numbers to a consistent format "{:,.2f}".format
-            formatted_inputAixAmount = float(inputAixAmount / 1e18)
-            formatted_distributedAixAmount = float(
-                distributedAixAmount / 1e18)
-            formatted_swappedEthAmount = float(swappedEthAmount / 1e18)
-            formatted_distributedEthAmount = float(
-                distributedEthAmount / 1e18)
-
-            # Retrieve the transaction receipt to get the initiator address
-            tx_receipt = w3.eth.get_transaction_receipt(
-                event['transactionHash'].hex())
-            distributor_wallet = tx_receipt['from']
-
-            # Get the balance of the distributor wallet
-            distributor_balance = float(
-                w3.eth.get_balance(distributor_wallet) / 1e18)
-
+                f"\n Starting Decoding {self.name} envent data for TX: {event['transactionHash'].hex()} \n")
+            tx_hash = event['transactionHash'].hex()
             # Get the timestamp of the transaction
-            block = w3.eth.get_block(event['blockNumber'])
-            timestamp = datetime.utcfromtimestamp(block['timestamp'])
-
-            event_data_dict = {
-                'aix_processed': formatted_inputAixAmount,
-                'aix_distributed': formatted_distributedAixAmount,
-                'eth_bought': formatted_swappedEthAmount,
-                'eth_distributed': formatted_distributedEthAmount,
-                'distributor_wallet': distributor_wallet,
-                'distributor_balance': distributor_balance,
-            }
-
-            event_data = {
-                'blockNumber': event['blockNumber'],
-                'name': event_config['db_name'],
-                'contractName': event_config['contractName'],
-                'blockHash': event['blockHash'].hex(),
-                'logIndex': event['logIndex'],
-                'removed': event['removed'],
-                'transactionIndex': event['transactionIndex'],
-                'transactionHash': event['transactionHash'].hex(),
-                'data': event_data_dict,
-                'timestamp': timestamp,
-            }
-
-            logger.info("TotalDistribution event data parsed successfully.")
+            timestamps = {event['blockNumber']: block_timestamp_cache.get(event['blockNumber'])}
+
+            senders, balances = {}, {}
+            if self.needs_sender:
+                # Retrieve the transaction receipt to get the initiator address
+                senders[tx_hash] = w3.eth.get_transaction_receipt(tx_hash)['from']
+            if 'balance' in self.enrich:
+                # Get the balance of the sender at the block of the event
+                balances = balance_cache.get_many(
+                    [(senders[tx_hash], event['blockNumber'])], timestamps, fetch_balances)
+
+            event_data = self.build_events(
+                [event], event_config, senders, balances, timestamps)[0]
+            if event_data:
+                logger.info(f"{self.name} event data parsed successfully.")
             return event_data
         except Exception as e:
             logger.error(
-                "Error parsing TotalDistribution event data: %s", e, exc_info=True)
-            return {}
+                f"Error parsing {self.name} event data: %s", e, exc_info=True)
+            raise
+
+    def parse_events(self, events, event_config):
+        """
+        Parses a page of events, fetching receipts, balances and uncached
+        block timestamps with JSON-RPC batch requests. Each transaction, block
+        and wallet is looked up once per page.
+
+        :param events: List of raw events.
+        :return: A list of dictionaries representing the parsed data.
+        """
+        if not events:
+            return []
+        try:
+            tx_hashes = list(dict.fromkeys(
+                event['transactionHash'].hex() for event in events))
+            block_numbers = list(dict.fromkeys(
+                event['blockNumber'] for event in events))
+
+            timestamps = block_timestamp_cache.get_many(
+                block_numbers, batch_fetch_block_timestamps)
+
+            senders, balances = {}, {}
+            if self.needs_sender:
+                receipts = batch_request(
+                    w3, [('eth_getTransactionReceipt', [tx_hash]) for tx_hash in tx_hashes])
+                senders = {tx_hash: Web3.to_checksum_address(receipt['from'])
+                           for tx_hash, receipt in zip(tx_hashes, receipts)}
+
+            if 'balance' in self.enrich:
+                balances = balance_cache.get_many(
+                    self.balance_keys(events, senders), timestamps, batch_fetch_balances)
+        except Exception as e:
+            logger.error(
+                f"Batched enrichment of {self.name} events failed, falling back to single lookups: %s", e, exc_info=True)
+            return super().parse_events(events, event_config)
+
+        parsed_events = self.build_events(
+            events, event_config, senders, balances, timestamps)
+        logger.info(
+            f"{len(parsed_events)} {self.name} events parsed with {len(senders)} receipts and {len(block_numbers)} blocks.")
+        return parsed_events
+
+    async def parse_events_async(self, events, event_config, async_w3):
+        """
+        Parses a page of events, fetching receipts, balances and uncached block
+        timestamps with concurrent async RPC calls.
+
+        :param events: List of raw events.
+        :param async_w3: AsyncWeb3 instance of the pipeline.
+        :return: A list of dictionaries representing the parsed data.
+        """
+        if not events:
+            return []
+        try:
+            tx_hashes = list(dict.fromkeys(
+                event['transactionHash'].hex() for event in events))
+            block_numbers = list(dict.fromkeys(
+                event['blockNumber'] for event in events))
+
+            timestamps, missing = await asyncio.to_thread(
+                block_timestamp_cache.lookup, block_numbers)
+            if missing:
+                blocks = await asyncio.gather(
+                    *(async_w3.eth.get_block(block_number) for block_number in missing))
+                fetched = {block_number: block['timestamp']
+                           for block_number, block in zip(missing, blocks)}
+                await asyncio.to_thread(block_timestamp_cache.store, fetched)
+                timestamps.update(fetched)
+
+            senders, balances = {}, {}
+            if self.needs_sender:
+                receipts = await asyncio.gather(
+                    *(async_w3.eth.get_transaction_receipt(tx_hash) for tx_hash in tx_hashes))
+                senders = {tx_hash: receipt['from']
+                           for tx_hash, receipt in zip(tx_hashes, receipts)}
+
+            if 'balance' in self.enrich:
+                async def fetch_missing(keys):
+                    values = await asyncio.gather(
+                        *(async_w3.eth.get_balance(wallet, block) for wallet, block in keys))
+                    return dict(zip(keys, values))
+                balances = await balance_cache.get_many_async(
+                    self.balance_keys(events, senders), timestamps, fetch_missing)
+        except Exception as e:
+            logger.error(
+                f"Async enrichment of {self.name} events failed, falling back to batched lookups: %s", e, exc_info=True)
+            return await asyncio.to_thread(self.parse_events, events, event_config)
+
+        parsed_events = self.build_events(
+            events, event_config, senders, balances, timestamps)
+        logger.info(
+            f"{len(parsed_events)} {self.name} events parsed with {len(senders)} receipts and {len(block_numbers)} blocks.")
+        return parsed_events
+
+    @staticmethod
+    def balance_keys(events, senders):
+        """Returns the distinct (sender, block number) pairs of a page of events."""
+        return list(dict.fromkeys(
+            (senders[event['transactionHash'].hex()], event['blockNumber']) for event in events))
+
+    def build_events(self, events, event_config, senders, balances, timestamps):
+        """
+        Decodes a page of events and combines it with its enrichment lookups.
+
+        :param senders: Dictionary of transaction hash to sender wallet.
+        :param balances: Dictionary of (sender wallet, block number) to balance in wei.
+        :param timestamps: Dictionary of block number to Unix timestamp.
+        :return: A list of dictionaries, None for events whose payload cannot be decoded.
+        """
+        parsed_events = []
+        for event, arguments in zip(events, self.decoder.decode(events)):
+            if arguments is None:
+                logger.error(
+                    f"Undecodable {self.name} payload in TX: {event['transactionHash'].hex()}")
+                parsed_events.append(None)
+                continue
+            parsed_events.append(self.build_event_data(
+                event, event_config, arguments, senders, balances, timestamps[event['blockNumber']]))
+        return parsed_events
+
+    def build_event_data(self, event, event_config, arguments, senders, balances, block_timestamp):
+        """
+        Builds the row of one event from its decoded arguments.
+
+        :param arguments: Dictionary of argument name to decoded value.
+        :param block_timestamp: Unix timestamp of the event block.
+        :return: A dictionary representing the parsed data.
+        """
+        event_data_dict = {}
+        amounts = {}
+        for name, value in arguments.items():
+            field = self.fields.get(name, name)
+            if field in self.columns:
+                amounts[self.columns[field]] = value
+                continue
+            if isinstance(value, bytes):
+                value = '0x' + value.hex()
+            elif isinstance(value, int) and not isinstance(value, bool) and self.decimals is not None:
+                value = float(scale_amount(value, self.decimals))
+            event_data_dict[field] = value
+
+        if self.needs_sender:
+            sender = senders[event['transactionHash'].hex()]
+            if 'sender' in self.enrich:
+                event_data_dict[self.enrich['sender']] = sender
+            if 'balance' in self.enrich:
+                field = self.enrich['balance']
+                balance = balances[(sender, event['blockNumber'])]
+                if field in self.columns:
+                    amounts[self.columns[field]] = balance
+                else:
+                    event_data_dict[field] = float(scale_amount(balance))
+
+        return {
+            'blockNumber': event['blockNumber'],
+            'name': event_config['db_name'],
+            'contractName': event_config['contractName'],
+            'blockHash': event['blockHash'].hex(),
+            'logIndex': event['logIndex'],
+            'removed': event['removed'],
+            'transactionIndex': event['transactionIndex'],
+            'transactionHash': event['transactionHash'].hex(),
+            'data': event_data_dict,
+            'timestamp': datetime.utcfromtimestamp(block_timestamp),
+            **amounts,
+        }
+
+
+class TotalDistributionParser(AbiEventParser):
+    """
+    Parser for TotalDistribution events, configured from EVENTS_CONFIG.
+    """
+
+    def __init__(self, event_config=None, decoder=None):
+        super().__init__(event_config or EVENTS_CONFIG['TotalDistribution'], decoder)
+
+
+class EventParserRegistry:
+    """
+    Parsers of the configured events, built once. Decoders are compiled once
+    per event signature and shared by every event with the same topic0.
+    """
+
+    def __init__(self, events_config):
+        self.decoders = {}
+        self.parsers = {}
+        for event_name, event_config in events_config.items():
+            self.parsers[event_name] = AbiEventParser(
+                event_config, self.get_decoder(event_config))
+
+    def get_decoder(self, event_config):
+        """Returns the decoder of an event, compiling it on first use."""
+        topic0 = event_config['topics'][0].lower()
+        if topic0 not in self.decoders:
+            self.decoders[topic0] = EventDecoder.from_abi(event_config['abi'], topic0)
+        return self.decoders[topic0]
+
+    def get(self, event_name):
+        """Returns the parser of an event, or None if it is not configured."""
+        return self.parsers.get(event_name)
+
+
+parser_registry = EventParserRegistry(EVENTS_CONFIG)
 
 
 def get_event_parser(event_name):
     """
-    Factory function to get the appropriate event parser based on the event name.
+    Returns the parser of an event from the registry.
 
     :param event_name: The name of the event.
-    :return: An instance of the appropriate subclass of EventParser.
+    :return: The AbiEventParser of the event.
     """
-    if event_name == "TotalDistribution":
-        return TotalDistributionParser()
-    else:
+    parser = parser_registry.get(event_name)
+    if parser is None:
         logger.error("No parser found for event: %s", event_name)
-        return None
+    return parser
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import websockets
+from web3._utils.method_formatters import log_entry_formatter
+from .config import ETH_WS_URL, LISTENER_CONFIG
+from .logging_config import logger
+from .rpc import w3
+from .models import Session, Event
+from .event_listener import (fetch_and_process_all_events, build_log_filter, route_logs, parse_routed_logs,
+                             save_windows, rollback_events, get_block_hash, BlockHashWindow)
+
+
+def subscribe_for_events(start_block, events_config):
+    """Live listener that receives new events over a WebSocket log subscription."""
+    asyncio.run(run_subscription(start_block, events_config))
+
+
+async def run_subscription(start_block, events_config):
+    """
+    Subscribes to the logs of every configured event with a single subscription
+    and stores each log as it arrives. On every (re)connect the hashes of the
+    recently stored blocks are verified, since removed logs of a reorganization
+    during the disconnect were never received, and the blocks missed since the
+    last processed block are filled with eth_getLogs.
+    """
+    event_names = ', '.join(events_config)
+    last_block = start_block - 1
+    block_hashes = await asyncio.to_thread(load_block_hashes, events_config, last_block)
+    while True:
+        try:
+            async with websockets.connect(ETH_WS_URL) as websocket:
+                subscription_id = await subscribe_logs(websocket, events_config)
+                fork_block = await asyncio.to_thread(
+                    block_hashes.find_fork, lambda block_number: get_block_hash(block_number).hex().lower())
+                if fork_block is not None:
+                    logger.warning(
+                        f"Chain reorganization detected while disconnected, re-ingesting from block {fork_block + 1}")
+                    await asyncio.to_thread(rollback_events, events_config, fork_block)
+                    last_block = min(last_block, fork_block)
+                # The subscription only delivers logs of blocks after the head,
+                # so the gap is filled up to the head itself, not to the
+                # confirmed block
+                head = await asyncio.to_thread(lambda: w3.eth.block_number)
+                logger.info(
+                    f"Subscribed to {event_names} logs, filling gap from block {last_block + 1} to {head}")
+                last_block = await asyncio.to_thread(
+                    fetch_and_process_all_events, events_config, last_block + 1, head)
+                if last_block >= 0:
+                    block_hashes.record(last_block, (await asyncio.to_thread(
+                        get_block_hash, last_block)).hex().lower())
+
+                async for message in websocket:
+                    notification = json.loads(message)
+                    params = notification.get('params', {})
+                    if params.get('subscription') != subscription_id:
+                        continue
+                    last_block = await asyncio.to_thread(
+                        handle_log, events_config, params['result'], last_block)
+                    record_log_block(block_hashes, params['result'])
+        except Exception as e:
+            logger.error(
+                f"{event_names} log subscription failed, reconnecting: {e}", exc_info=True)
+        await asyncio.sleep(LISTENER_CONFIG['reconnect_seconds'])
+
+
+def load_block_hashes(events_config, last_block):
+    """
+    Loads the stored hashes of the blocks holding events near the last processed
+    block, so a reorganization before a restart is detected on connect.
+
+    :return: A BlockHashWindow of the stored blocks.
+    """
+    block_hashes = BlockHashWindow()
+    session = Session()
+    try:
+        stored = {}
+        for event_name in events_config:
+            stored.update(Event.get_block_hashes(
+                session, event_name, last_block - block_hashes.size))
+    finally:
+        session.close()
+    for block_number in sorted(stored):
+        block_hashes.record(block_number, stored[block_number].lower())
+    return block_hashes
+
+
+def record_log_block(block_hashes, raw_log):
+    """Remembers the block hash of a subscription log, or forgets it if the log was removed."""
+    block_number = int(raw_log['blockNumber'], 16)
+    if raw_log.get('removed'):
+        block_hashes.discard_after(block_number - 1)
+    else:
+        block_hashes.record(block_number, raw_log['blockHash'].lower())
+
+
+async def subscribe_logs(websocket, events_config):
+    """
+    Sends eth_subscribe for the logs of the configured events.
+
+    :return: The subscription id.
+    """
+    await websocket.send(json.dumps({
+        'jsonrpc': '2.0',
+        'id': 1,
+        'method': 'eth_subscribe',
+        'params': ['logs', build_log_filter(events_config)],
+    }))
+    response = json.loads(await websocket.recv())
+    if 'error' in response:
+        raise ValueError(response['error'])
+    return response['result']
+
+
+def handle_log(events_config, raw_log, last_block):
+    """
+    Parses and stores a log received from the subscription.
+
+    :param raw_log: The log as sent by the node, with hex encoded values.
+    :param last_block: The last fully processed block.
+    :return: The new last fully processed block.
+    """
+    log = log_entry_formatter(raw_log)
+    if log['removed']:
+        # The block left the canonical chain, the node sends the logs of the
+        # replacing blocks as new notifications
+        logger.warning(
+            f"Removed log received for TX: {log['transactionHash'].hex()}, rolling back block {log['blockNumber']}")
+        rollback_events(events_config, log['blockNumber'] - 1)
+        return min(last_block, log['blockNumber'] - 1)
+
+    if last_block < log['blockNumber'] - 1:
+        # Blocks the gap fill did not reach are fetched before the cursor
+        # moves past them
+        logger.info(
+            f"Filling blocks {last_block + 1}-{log['blockNumber'] - 1} before the subscription log")
+        last_block = fetch_and_process_all_events(
+            events_config, last_block + 1, log['blockNumber'] - 1)
+    # Later logs of the same block may still arrive, so only the previous block is complete
+    save_windows(parse_routed_logs(
+        events_config, route_logs(events_config, [log])), last_block)
+    return last_block
@@ -1,18 +1,27 @@
 # models.py
 
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, UniqueConstraint, Boolean, BigInteger, Text, JSON
+from sqlalchemy import create_engine, inspect, update, cast, Column, Integer, Float, Numeric, String, DateTime, UniqueConstraint, Index, Boolean, BigInteger, Text, JSON, text, func, select, literal, case, and_, or_
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, timedelta
 from .logging_config import logger
-from .config import PG_DB_URI, EVENTS_CONFIG
+from .config import PG_DB_URI, EVENTS_CONFIG, EVENTS_PARTITION_CONFIG
 
 # Define the base class
 Base = declarative_base()
 
 
+# Partitioned tables need the partition key in every unique constraint
+PARTITIONED = EVENTS_PARTITION_CONFIG['enabled']
+
+# Holds any uint256 amount exactly
+Amount = Numeric(78, 0)
+
+
 class Event(Base):
     __tablename__ = 'events'
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(50), nullable=False)
     contractName = Column(String(10), nullable=False)
     blockNumber = Column(BigInteger)
@@ -20,16 +29,31 @@ class Event(Base):
     transactionIndex = Column(Integer)
     transactionHash = Column(String(66))
     data = Column(JSON)  # Store event-specific data as JSON
-    timestamp = Column(DateTime)
+    timestamp = Column(DateTime, primary_key=PARTITIONED)
     # Optional field for events that include log index
     logIndex = Column(Integer, nullable=True)
     # Optional field to indicate if the event was removed
     removed = Column(Boolean, default=False)
+    # Raw integer amounts of known events, in the token's smallest unit
+    aixProcessed = Column(Amount)
+    aixDistributed = Column(Amount)
+    ethBought = Column(Amount)
+    ethDistributed = Column(Amount)
+    distributorBalance = Column(Amount)
 
-    # Define unique constraint within the class using __table_args__
+    AMOUNT_COLUMNS = ('aixProcessed', 'aixDistributed',
+                      'ethBought', 'ethDistributed', 'distributorBalance')
+
+    # Define unique constraint and indexes within the class using __table_args__
     __table_args__ = (
         UniqueConstraint('blockNumber', 'transactionIndex', 'transactionHash',
+                         *(['timestamp'] if PARTITIONED else []),
                          name='uix_blocknumber_txindex_txhash'),
+        # Report windows filter by name and timestamp
+        Index('ix_events_name_timestamp', 'name', 'timestamp'),
+        # Resume and reorg queries filter by name and block number
+        Index('ix_events_name_blocknumber', 'name', 'blockNumber'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'} if PARTITIONED else {},
     )
 
     @staticmethod
@@ -43,6 +67,8 @@ class Event(Base):
         try:
             event = Event(**event_data)
             session.add(event)
+            session.flush()
+            EventRollup.add_events(session, Event.id == event.id)
             session.commit()
             logger.info(
                 f"Event {event_name} successfully inserted into the database. \nTxHash: {event_data['transactionHash']} \nLogIndex: {event_data['logIndex']} \nTransactionIndex: {event_data['transactionIndex']}")
@@ -58,6 +84,38 @@ class Event(Base):
                 f"Error inserting event {event_name} into the database: {e}", exc_info=True)
             return False
 
+    @staticmethod
+    def insert_events(session, event_name, events_data, commit=True):
+        """
+        Inserts a page of events in one statement, skipping events that already exist.
+        :param session: Database session
+        :param event_name: Name of the event
+        :param events_data: List of dictionaries containing event data
+        :param commit: Commit the session, pass False to join a larger transaction
+        :return: Tuple of (inserted, skipped) row counts
+        """
+        if not events_data:
+            return 0, 0
+        try:
+            result = session.execute(
+                insert(Event).values(events_data).on_conflict_do_nothing(
+                    constraint='uix_blocknumber_txindex_txhash').returning(Event.id))
+            inserted_ids = [row.id for row in result]
+            inserted = len(inserted_ids)
+            if inserted_ids:
+                EventRollup.add_events(session, Event.id.in_(inserted_ids))
+            if commit:
+                session.commit()
+            skipped = len(events_data) - inserted
+            logger.info(
+                f"{inserted} {event_name} events inserted into the database, {skipped} duplicates skipped.")
+            return inserted, skipped
+        except Exception as e:
+            session.rollback()
+            logger.error(
+                f"Error inserting {event_name} events into the database: {e}", exc_info=True)
+            raise
+
     @staticmethod
     def reset_table():
         """
@@ -88,6 +146,62 @@ class Event(Base):
             logger.error(
                 "An error occurred when deleting {event_name} %s", e, exc_info=True)
 
+    @staticmethod
+    def rollback_after_block(session, event_name, block_number):
+        """
+        Deletes the events above a block after a chain reorganization, recomputes
+        the rollups they were part of and rewinds the sync cursor to the block.
+        :param session: Database session
+        :param event_name: Name of the event
+        :param block_number: Last block that is still on the canonical chain
+        :return: Number of deleted events
+        """
+        try:
+            removed = (Event.name == event_name, Event.blockNumber > block_number)
+            first_removed_time = session.query(
+                func.min(Event.timestamp)).filter(*removed).scalar()
+            deleted = session.query(Event).filter(
+                *removed).delete(synchronize_session=False)
+            if first_removed_time:
+                EventRollup.rebuild_since(session, event_name, first_removed_time)
+            SyncState.set_last_block_number(
+                session, event_name, block_number, commit=False)
+            session.commit()
+            logger.warning(
+                f"{deleted} {event_name} events after block {block_number} rolled back.")
+            return deleted
+        except Exception as e:
+            session.rollback()
+            logger.error(
+                f"Error rolling back {event_name} events after block {block_number}: {e}", exc_info=True)
+            raise
+
+    @staticmethod
+    def get_block_hashes(session, event_name, since_block):
+        """
+        Retrieves the stored hashes of the blocks holding events above a block.
+        :param session: Database session
+        :param event_name: Name of the event
+        :param since_block: Blocks up to this one are skipped
+        :return: Dictionary of block number to block hash
+        """
+        rows = session.query(Event.blockNumber, Event.blockHash).filter(
+            Event.name == event_name, Event.blockNumber > since_block).distinct().all()
+        return {block_number: block_hash for block_number, block_hash in rows}
+
+    @staticmethod
+    def get_latest_event(session, event_name, since=None):
+        """
+        Retrieves the most recent event for a given event name.
+        :param session: Database session
+        :param event_name: Name of the event
+        :param since: Optional start of the time window
+        """
+        query = session.query(Event).filter(Event.name == event_name)
+        if since:
+            query = query.filter(Event.timestamp >= since)
+        return query.order_by(Event.timestamp.desc(), Event.id.desc()).first()
+
     @staticmethod
     def get_last_event_block_number(session, event_name):
         """
@@ -107,10 +221,459 @@ class Event(Base):
             return None
 
 
+class EventRollup(Base):
+    __tablename__ = 'event_rollups'
+    name = Column(String(50), primary_key=True)
+    # Bucket size, 'hour' or 'day'
+    grain = Column(String(4), primary_key=True)
+    # Start of the time bucket
+    bucket = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    # Sums of the raw event amounts
+    aixProcessed = Column(Amount, nullable=False)
+    aixDistributed = Column(Amount, nullable=False)
+    ethBought = Column(Amount, nullable=False)
+    ethDistributed = Column(Amount, nullable=False)
+    firstTxTime = Column(DateTime, nullable=False)
+    lastTxTime = Column(DateTime, nullable=False)
+
+    GRAINS = ('hour', 'day')
+    AMOUNT_FIELDS = ('aixProcessed', 'aixDistributed',
+                     'ethBought', 'ethDistributed')
+
+    @staticmethod
+    def add_events(session, *conditions):
+        """
+        Adds the events matching the conditions to the hourly and daily rollups.
+        Does not commit, so the rollups change in the transaction that inserts the events.
+        :param session: Database session
+        :param conditions: Filters selecting the newly inserted events
+        """
+        for grain in EventRollup.GRAINS:
+            statement = insert(EventRollup).from_select(
+                ['name', 'grain', 'bucket', 'count', *EventRollup.AMOUNT_FIELDS,
+                 'firstTxTime', 'lastTxTime'],
+                EventRollup.aggregate_events(grain, *conditions))
+            excluded = statement.excluded
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['name', 'grain', 'bucket'],
+                set_={
+                    'count': EventRollup.count + excluded.count,
+                    **{field: getattr(EventRollup, field) + getattr(excluded, field)
+                       for field in EventRollup.AMOUNT_FIELDS},
+                    'firstTxTime': case((excluded.firstTxTime < EventRollup.firstTxTime, excluded.firstTxTime),
+                                        else_=EventRollup.firstTxTime),
+                    'lastTxTime': case((excluded.lastTxTime > EventRollup.lastTxTime, excluded.lastTxTime),
+                                       else_=EventRollup.lastTxTime),
+                }))
+
+    @staticmethod
+    def aggregate_events(grain, *conditions):
+        """
+        Builds a query aggregating the matching events into buckets of the given grain.
+        :param grain: Bucket size, 'hour' or 'day'
+        :param conditions: Filters on the events table
+        """
+        bucket = func.date_trunc(grain, Event.timestamp)
+        return select(
+            Event.name, literal(grain), bucket, func.count(Event.id),
+            *[func.coalesce(func.sum(getattr(Event, field)), 0)
+              for field in EventRollup.AMOUNT_FIELDS],
+            func.min(Event.timestamp), func.max(Event.timestamp),
+        ).where(*conditions).group_by(Event.name, bucket)
+
+    @staticmethod
+    def rebuild(session, event_name):
+        """
+        Recomputes the rollups of a given event name from the events table.
+        :param session: Database session
+        :param event_name: Name of the event
+        """
+        try:
+            session.query(EventRollup).filter(
+                EventRollup.name == event_name).delete()
+            EventRollup.add_events(session, Event.name == event_name)
+            session.commit()
+            logger.info(f"{event_name} rollups rebuilt.")
+        except Exception as e:
+            session.rollback()
+            logger.error(
+                f"Error rebuilding rollups for {event_name}: {e}", exc_info=True)
+
+    @staticmethod
+    def rebuild_since(session, event_name, since):
+        """
+        Recomputes the rollups of a given event name from the start of the day of
+        a timestamp onwards. Does not commit.
+        :param session: Database session
+        :param event_name: Name of the event
+        :param since: Earliest timestamp whose buckets changed
+        """
+        day_start = since.replace(hour=0, minute=0, second=0, microsecond=0)
+        session.query(EventRollup).filter(
+            EventRollup.name == event_name, EventRollup.bucket >= day_start).delete(synchronize_session=False)
+        EventRollup.add_events(session, Event.name == event_name,
+                               Event.timestamp >= day_start)
+
+    @staticmethod
+    def has_rollups(session, event_name):
+        """
+        Checks whether any rollup exists for a given event name.
+        :param session: Database session
+        :param event_name: Name of the event
+        """
+        return session.query(EventRollup.name).filter(
+            EventRollup.name == event_name).first() is not None
+
+    @staticmethod
+    def delete_rollups(session, event_name):
+        """
+        Deletes the rollups of a given event name.
+        :param session: Database session
+        :param event_name: Name of the event
+        """
+        try:
+            session.query(EventRollup).filter(
+                EventRollup.name == event_name).delete()
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(
+                f"Error deleting rollups for {event_name}: {e}", exc_info=True)
+
+    @staticmethod
+    def get_window_totals(session, event_name, since, until):
+        """
+        Totals the events of a time window. Whole days and hours inside the window
+        are read from the rollups, only the partial hours at its edges from events.
+        :param session: Database session
+        :param event_name: Name of the event
+        :param since: Start of the window
+        :param until: End of the window
+        :return: Dictionary with the event count, raw amount sums and first and last tx times
+        """
+        hour_start = since.replace(minute=0, second=0, microsecond=0)
+        if hour_start < since:
+            hour_start += timedelta(hours=1)
+        hour_end = until.replace(minute=0, second=0, microsecond=0)
+        if hour_start >= hour_end:
+            return EventRollup.aggregate_raw(
+                session, event_name, Event.timestamp >= since, Event.timestamp <= until)
+
+        day_start = hour_start.replace(hour=0)
+        if day_start < hour_start:
+            day_start += timedelta(days=1)
+        day_end = hour_end.replace(hour=0)
+        if day_start < day_end:
+            buckets = or_(
+                and_(EventRollup.grain == 'day', EventRollup.bucket >= day_start,
+                     EventRollup.bucket < day_end),
+                and_(EventRollup.grain == 'hour', or_(
+                    and_(EventRollup.bucket >= hour_start, EventRollup.bucket < day_start),
+                    and_(EventRollup.bucket >= day_end, EventRollup.bucket < hour_end))))
+        else:
+            buckets = and_(EventRollup.grain == 'hour', EventRollup.bucket >= hour_start,
+                           EventRollup.bucket < hour_end)
+
+        rollup = session.query(
+            func.coalesce(func.sum(EventRollup.count), 0).label('count'),
+            *[func.coalesce(func.sum(getattr(EventRollup, field)), 0).label(field)
+              for field in EventRollup.AMOUNT_FIELDS],
+            func.min(EventRollup.firstTxTime).label('first_tx_time'),
+            func.max(EventRollup.lastTxTime).label('last_tx_time'),
+        ).filter(EventRollup.name == event_name, buckets).one()
+        edges = EventRollup.aggregate_raw(
+            session, event_name, or_(
+                and_(Event.timestamp >= since, Event.timestamp < hour_start),
+                and_(Event.timestamp >= hour_end, Event.timestamp <= until)))
+
+        times = [time for time in (rollup.first_tx_time, rollup.last_tx_time,
+                                   edges['first_tx_time'], edges['last_tx_time']) if time]
+        return {
+            'count': rollup.count + edges['count'],
+            **{field: getattr(rollup, field) + edges[field] for field in EventRollup.AMOUNT_FIELDS},
+            'first_tx_time': min(times) if times else None,
+            'last_tx_time': max(times) if times else None,
+        }
+
+    @staticmethod
+    def aggregate_raw(session, event_name, *conditions):
+        """
+        Totals the matching events directly from the events table.
+        :param session: Database session
+        :param event_name: Name of the event
+        :param conditions: Filters on the events table
+        """
+        row = session.query(
+            func.count(Event.id).label('count'),
+            *[func.coalesce(func.sum(getattr(Event, field)), 0).label(field)
+              for field in EventRollup.AMOUNT_FIELDS],
+            func.min(Event.timestamp).label('first_tx_time'),
+            func.max(Event.timestamp).label('last_tx_time'),
+        ).filter(Event.name == event_name, *conditions).one()
+        return dict(row._mapping)
+
+
+class SyncState(Base):
+    __tablename__ = 'sync_state'
+    name = Column(String(50), primary_key=True)
+    # Last block whose logs were fully fetched and stored
+    lastBlockNumber = Column(BigInteger, nullable=False)
+    updatedAt = Column(DateTime, nullable=False)
+
+    @staticmethod
+    def set_last_block_number(session, event_name, block_number, commit=True):
+        """
+        Records the last fully processed block for a given event name.
+        :param session: Database session
+        :param event_name: Name of the event
+        :param block_number: Last block whose window was processed
+        :param commit: Commit the session, pass False to join a larger transaction
+        """
+        try:
+            session.execute(insert(SyncState).values(
+                name=event_name, lastBlockNumber=block_number, updatedAt=datetime.utcnow()
+            ).on_conflict_do_update(index_elements=['name'], set_={
+                'lastBlockNumber': block_number, 'updatedAt': datetime.utcnow()}))
+            if commit:
+                session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(
+                f"Error saving sync checkpoint for {event_name}: {e}", exc_info=True)
+            raise
+
+    @staticmethod
+    def delete_state(session, event_name):
+        """
+        Deletes the sync checkpoint of a given event name.
+        :param session: Database session
+        :param event_name: Name of the event
+        """
+        try:
+            session.query(SyncState).filter(SyncState.name == event_name).delete()
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(
+                f"Error deleting sync checkpoint for {event_name}: {e}", exc_info=True)
+
+    @staticmethod
+    def get_last_block_number(session, event_name):
+        """
+        Retrieves the last fully processed block for a given event name.
+        :param session: Database session
+        :param event_name: Name of the event
+        """
+        try:
+            state = session.get(SyncState, event_name)
+            return state.lastBlockNumber if state else None
+        except Exception as e:
+            logger.error(
+                f"Error retrieving sync checkpoint for {event_name}: {e}", exc_info=True)
+            return None
+
+
+class ReportState(Base):
+    __tablename__ = 'report_state'
+    name = Column(String(50), primary_key=True)
+    # When the report of the event was last sent
+    lastSentAt = Column(DateTime, nullable=False)
+
+    @staticmethod
+    def set_last_sent_at(session, event_name, sent_at):
+        """
+        Records when the report of a given event name was sent.
+        :param session: Database session
+        :param event_name: Name of the event
+        :param sent_at: Time the report was sent
+        """
+        try:
+            session.execute(insert(ReportState).values(
+                name=event_name, lastSentAt=sent_at
+            ).on_conflict_do_update(index_elements=['name'], set_={'lastSentAt': sent_at}))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(
+                f"Error saving report state for {event_name}: {e}", exc_info=True)
+            raise
+
+    @staticmethod
+    def get_last_sent_at(session, event_name):
+        """
+        Retrieves when the report of a given event name was last sent.
+        :param session: Database session
+        :param event_name: Name of the event
+        """
+        try:
+            state = session.get(ReportState, event_name)
+            return state.lastSentAt if state else None
+        except Exception as e:
+            logger.error(
+                f"Error retrieving report state for {event_name}: {e}", exc_info=True)
+            return None
+
+
+class BlockTimestamp(Base):
+    __tablename__ = 'block_timestamps'
+    blockNumber = Column(BigInteger, primary_key=True, autoincrement=False)
+    # Unix timestamp of the block
+    timestamp = Column(BigInteger, nullable=False)
+
+    @staticmethod
+    def get_timestamps(session, block_numbers):
+        """
+        Retrieves the stored timestamps of the given blocks.
+        :param session: Database session
+        :param block_numbers: Block numbers to look up
+        :return: Dictionary of block number to Unix timestamp for the stored blocks
+        """
+        try:
+            rows = session.query(BlockTimestamp).filter(
+                BlockTimestamp.blockNumber.in_(block_numbers)).all()
+            return {row.blockNumber: row.timestamp for row in rows}
+        except Exception as e:
+            logger.error(
+                f"Error retrieving block timestamps: {e}", exc_info=True)
+            return {}
+
+    @staticmethod
+    def save_timestamps(session, timestamps):
+        """
+        Stores block timestamps, ignoring blocks that are already stored.
+        :param session: Database session
+        :param timestamps: Dictionary of block number to Unix timestamp
+        """
+        try:
+            session.execute(insert(BlockTimestamp).values(
+                [{'blockNumber': block_number, 'timestamp': timestamp}
+                 for block_number, timestamp in timestamps.items()]
+            ).on_conflict_do_nothing(index_elements=['blockNumber']))
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.error(
+                f"Error saving block timestamps: {e}", exc_info=True)
+            return False
+
+
+def create_event_indexes(engine):
+    """
+    Creates the indexes of the events table when it was created before they
+    were declared.
+    :param engine: SQLAlchemy engine instance
+    """
+    for index in Event.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+
+def create_event_columns(engine):
+    """
+    Adds the amount columns to an events table created before they were
+    declared and fills them from the data of the stored events. Amounts that
+    were stored as floats are only as exact as the floats; run "app.py 0" to
+    re-ingest them exactly.
+    :param engine: SQLAlchemy engine instance
+    """
+    existing = {column['name'] for column in inspect(engine).get_columns('events')}
+    missing = [name for name in Event.AMOUNT_COLUMNS if name not in existing]
+    if not missing:
+        return
+    with engine.begin() as connection:
+        for name in missing:
+            connection.execute(text(
+                f'ALTER TABLE events ADD COLUMN "{name}" NUMERIC(78, 0)'))
+        for event_config in EVENTS_CONFIG.values():
+            factor = 10 ** event_config.get('decimals', 0)
+            for field, name in event_config.get('columns', {}).items():
+                if name in missing:
+                    connection.execute(update(Event).where(
+                        Event.name == event_config['db_name'], Event.data[field].isnot(None)
+                    ).values({name: func.round(cast(Event.data[field].as_string(), Numeric) * factor)}))
+    logger.info(f"Added amount columns {', '.join(missing)} to the events table.")
+
+
+def drop_outdated_rollups(engine):
+    """
+    Drops an event_rollups table with float sums, it is recreated with exact
+    sums and rebuilt from the events on the next start.
+    :param engine: SQLAlchemy engine instance
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table('event_rollups'):
+        return
+    columns = {column['name'] for column in inspector.get_columns('event_rollups')}
+    if not set(EventRollup.AMOUNT_FIELDS) <= columns:
+        EventRollup.__table__.drop(engine)
+        logger.info("Dropped the float event_rollups table, it will be rebuilt.")
+
+
+def create_event_partitions(engine, start, months_ahead):
+    """
+    Creates the monthly partitions of the events table from the start date up to
+    a number of months past the current month, plus a default partition.
+    Rows that landed in the default partition because their month had no
+    partition yet are moved into the new partition.
+    :param engine: SQLAlchemy engine instance
+    :param start: First month to partition, as a datetime
+    :param months_ahead: Number of future months to create
+    """
+    now = datetime.utcnow()
+    last_month = now.year * 12 + now.month - 1 + months_ahead
+    month = start.year * 12 + start.month - 1
+    while month <= last_month:
+        month_start = datetime(month // 12, month % 12 + 1, 1)
+        month_end = datetime((month + 1) // 12, (month + 1) % 12 + 1, 1)
+        with engine.begin() as connection:
+            create_event_partition(connection, month_start, month_end)
+        month += 1
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS events_default PARTITION OF events DEFAULT"))
+    logger.info("Monthly partitions of the events table are up to date.")
+
+
+def create_event_partition(connection, month_start, month_end):
+    """
+    Creates the partition of one month. A partition overlapping rows of the
+    default partition cannot be created directly, so those rows are moved to
+    a new table that is then attached as the partition.
+    :param connection: Connection inside a transaction
+    :param month_start: First day of the month
+    :param month_end: First day of the next month
+    """
+    partition = f"events_{month_start:%Y_%m}"
+    bounds = f"FROM ('{month_start:%Y-%m-%d}') TO ('{month_end:%Y-%m-%d}')"
+    if connection.execute(text("SELECT to_regclass(:name)"), {'name': partition}).scalar():
+        return
+    if not connection.execute(text("SELECT to_regclass('events_default')")).scalar():
+        connection.execute(text(f"CREATE TABLE {partition} PARTITION OF events FOR VALUES {bounds}"))
+        return
+    in_range = (f"timestamp >= '{month_start:%Y-%m-%d}' AND timestamp < '{month_end:%Y-%m-%d}'")
+    # Keeps inserts out of the default partition until the rows are moved
+    connection.execute(text("LOCK TABLE events_default IN SHARE ROW EXCLUSIVE MODE"))
+    connection.execute(text(
+        f"CREATE TABLE {partition} (LIKE events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = connection.execute(text(
+        f"WITH moved AS (DELETE FROM events_default WHERE {in_range} RETURNING *) "
+        f"INSERT INTO {partition} SELECT * FROM moved")).rowcount
+    connection.execute(text(f"ALTER TABLE events ATTACH PARTITION {partition} FOR VALUES {bounds}"))
+    if moved:
+        logger.info(f"Moved {moved} events from events_default to {partition}.")
+
+
 # Create the database engine
 try:
     engine = create_engine(PG_DB_URI)
+    drop_outdated_rollups(engine)
     Base.metadata.create_all(engine)
+    create_event_columns(engine)
+    create_event_indexes(engine)
+    if PARTITIONED:
+        create_event_partitions(engine, datetime.fromisoformat(EVENTS_PARTITION_CONFIG['start']),
+                                EVENTS_PARTITION_CONFIG['months_ahead'])
 except Exception as e:
     logger.error(
         f"Error creating database engine or tables: {e}", exc_info=True)
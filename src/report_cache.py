@@ -0,0 +1,108 @@
+import asyncio
+import time
+from collections import OrderedDict
+from threading import Lock
+from .models import Session, Event
+from .report_generators import get_report_generator
+from .config import EVENTS_CONFIG, REPORT_CACHE_CONFIG
+
+
+class ReportCache:
+    """
+    Rendered reports keyed by event name, window and the block of the latest
+    ingested event, so every group and command asking for the same report
+    shares one render. A new event changes the key, entries also expire after
+    a TTL since reports show relative times, and the least recently used
+    entries are evicted beyond max_entries.
+    """
+
+    def __init__(self, ttl_seconds=None, max_entries=None, block_check_seconds=None):
+        self.ttl_seconds = ttl_seconds or REPORT_CACHE_CONFIG['ttl_seconds']
+        self.max_entries = max_entries or REPORT_CACHE_CONFIG['max_entries']
+        self.block_check_seconds = REPORT_CACHE_CONFIG['block_check_seconds'] \
+            if block_check_seconds is None else block_check_seconds
+        self.reports = OrderedDict()
+        # Latest event block by event name as (block_number, checked_at)
+        self.latest_blocks = {}
+        self.rendering = {}
+        self.lock = Lock()
+
+    def latest_block(self, event_name):
+        """
+        Returns the block of the latest stored event, read from the database
+        at most every block_check_seconds.
+        """
+        now = time.monotonic()
+        with self.lock:
+            cached = self.latest_blocks.get(event_name)
+        if cached and now - cached[1] < self.block_check_seconds:
+            return cached[0]
+        session = Session()
+        try:
+            block_number = Event.get_last_event_block_number(session, event_name)
+        finally:
+            session.close()
+        with self.lock:
+            self.latest_blocks[event_name] = (block_number, now)
+        return block_number
+
+    def lookup(self, key):
+        """Returns a cached report, or None if it is missing or expired."""
+        with self.lock:
+            entry = self.reports.get(key)
+            if entry is None:
+                return None
+            report, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.reports[key]
+                return None
+            self.reports.move_to_end(key)
+            return report
+
+    def store(self, key, report):
+        with self.lock:
+            self.reports[key] = (report, time.monotonic() + self.ttl_seconds)
+            self.reports.move_to_end(key)
+            while len(self.reports) > self.max_entries:
+                self.reports.popitem(last=False)
+
+    def render(self, event_name, hours=None):
+        """Renders a report with the event's report generator."""
+        report_generator = get_report_generator(event_name, hours)
+        if report_generator is None:
+            return None
+        return report_generator.generate_report()
+
+    def get_report(self, event_name, hours=None):
+        """
+        Returns the report of an event, rendering it if it is not cached.
+
+        :param hours: Length of the report window, the event's report_interval_hours if None.
+        """
+        hours = hours or EVENTS_CONFIG[event_name]['report_interval_hours']
+        key = (event_name, hours, self.latest_block(event_name))
+        report = self.lookup(key)
+        if report is None:
+            report = self.render(event_name, hours)
+            if report is not None:
+                self.store(key, report)
+        return report
+
+    async def get_report_async(self, event_name, hours=None):
+        """
+        Returns the report of an event without blocking the event loop.
+        Concurrent requests for the same report wait for a single render.
+        """
+        hours = hours or EVENTS_CONFIG[event_name]['report_interval_hours']
+        key = (event_name, hours)
+        rendering = self.rendering.get(key)
+        if rendering is None:
+            rendering = asyncio.ensure_future(
+                asyncio.to_thread(self.get_report, event_name, hours))
+            self.rendering[key] = rendering
+            rendering.add_done_callback(lambda _: self.rendering.pop(key, None))
+        return await asyncio.shield(rendering)
+
+
+report_cache = ReportCache()
+
@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from sqlalchemy import func
-from .models import Session, Event
+from .models import Session, Event, EventRollup
 from .config import EVENTS_CONFIG
+from .abi_decoder import scale_amount
 from .logging_config import logger
 
 
@@ -10,8 +12,12 @@ class ReportGenerator:
     Base class for generating reports for different events.
     """
 
-    def __init__(self, event_name):
+    def __init__(self, event_name, hours=None):
+        """
+        :param hours: Length of the report window, the event's report_interval_hours if None.
+        """
         self.event_name = event_name
+        self.hours = hours or EVENTS_CONFIG[event_name]['report_interval_hours']
         self.session = Session()
 
     def generate_report(self):
@@ -20,14 +26,18 @@ class ReportGenerator:
         """
         raise NotImplementedError("Subclasses must implement this method")
 
+    def get_time_ago(self):
+        """
+        Returns the start of the report window.
+        """
+        return datetime.utcnow() - timedelta(hours=self.hours)
+
     def get_events(self):
         """
         Retrieves events from the last specified number of hours.
         """
         try:
-            time_ago = datetime.utcnow() - \
-                timedelta(
-                    hours=EVENTS_CONFIG[self.event_name]['report_interval_hours'])
+            time_ago = self.get_time_ago()
             events = self.session.query(Event).filter(Event.name == self.event_name).filter(
                 Event.timestamp >= time_ago).all()
             return events
@@ -44,28 +54,42 @@ class TotalDistributionReportGenerator(ReportGenerator):
     Report generator for TotalDistribution events.
     """
 
+    def get_totals(self):
+        """
+        Totals the events of the report window from the hourly and daily rollups
+        and adds the distributor wallet of the most recent event. Amounts are
+        raw integers, scaled by generate_report.
+        """
+        try:
+            time_ago = self.get_time_ago()
+            totals = EventRollup.get_window_totals(
+                self.session, self.event_name, time_ago, datetime.utcnow())
+            latest_event = Event.get_latest_event(
+                self.session, self.event_name, time_ago)
+            return SimpleNamespace(
+                **totals,
+                distributor_wallet=latest_event.data['distributor_wallet'] if latest_event else None,
+                distributor_balance=latest_event.distributorBalance if latest_event else None)
+        except Exception as e:
+            logger.telegram.error(
+                "Error generating report: %s", e, exc_info=True)
+            return None
+        finally:
+            self.session.close()
+
     def generate_report(self):
-        events = self.get_events()
+        totals = self.get_totals()
         try:
-            if events:
-                # Calculate sums using dictionary key access
-                aix_processed_sum = sum(
-                    event.data['aix_processed'] for event in events)
-                aix_distributed_sum = sum(
-                    event.data['aix_distributed'] for event in events)
-                eth_bought_sum = sum(
-                    event.data['eth_bought'] for event in events)
-                eth_distributed_sum = sum(
-                    event.data['eth_distributed'] for event in events)
-
-                # Calculate times
-                first_tx_time = min(event.timestamp for event in events)
-                last_tx_time = max(event.timestamp for event in events)
-
-                # Get the most recent distributor wallet info using dictionary key access
-                most_recent_event = events[-1]
-                distributor_wallet = most_recent_event.data['distributor_wallet']
-                distributor_balance = most_recent_event.data['distributor_balance']
+            if totals and totals.count:
+                decimals = EVENTS_CONFIG[self.event_name].get('decimals', 18)
+                aix_processed_sum = scale_amount(totals.aixProcessed, decimals)
+                aix_distributed_sum = scale_amount(totals.aixDistributed, decimals)
+                eth_bought_sum = scale_amount(totals.ethBought, decimals)
+                eth_distributed_sum = scale_amount(totals.ethDistributed, decimals)
+                first_tx_time = totals.first_tx_time
+                last_tx_time = totals.last_tx_time
+                distributor_wallet = totals.distributor_wallet
+                distributor_balance = scale_amount(totals.distributor_balance or 0)
 
                 hours_first_tx = (datetime.utcnow() -
                                   first_tx_time).total_seconds() // 3600
@@ -96,20 +120,30 @@ class TotalDistributionReportGenerator(ReportGenerator):
                 return report
             else:
                 logger.info(
-                    f"No {self.event_name} events found in the last {EVENTS_CONFIG[self.event_name]['report_interval_hours']}h.")
-                return f"No {self.event_name} events found in the last {EVENTS_CONFIG[self.event_name]['report_interval_hours']}h."
+                    f"No {self.event_name} events found in the last {self.hours}h.")
+                return f"No {self.event_name} events found in the last {self.hours}h."
         except Exception as e:
             logger.telegram.error(
                 "Error generating report: %s", e, exc_info=True)
             return f"Error generating report: {e}"
 
 
-def get_report_generator(event_name):
+# Report generators by report type. An event uses the type named by its
+# "report" option, which defaults to the event name.
+REPORT_GENERATORS = {
+    "TotalDistribution": TotalDistributionReportGenerator,
+}
+
+
+def get_report_generator(event_name, hours=None):
     """
     Factory function to get the appropriate report generator based on the event name.
+
+    :param hours: Optional length of the report window in hours.
     """
-    if event_name == "TotalDistribution":
-        return TotalDistributionReportGenerator(event_name)
-    else:
+    report_type = EVENTS_CONFIG.get(event_name, {}).get('report', event_name)
+    generator_class = REPORT_GENERATORS.get(report_type)
+    if generator_class is None:
         logger.error(f"No report generator found for event: {event_name}")
         return None
+    return generator_class(event_name, hours)
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+from .models import Session, ReportState
+from .config import EVENTS_CONFIG, REPORT_SCHEDULER_CONFIG
+from .logging_config import logger
+
+
+class ReportScheduler:
+    """
+    Sends the report of every active event each report_interval_hours from
+    inside the bot's event loop. Send times are stored in the report_state
+    table, so a restart neither repeats nor skips a report.
+    """
+
+    def __init__(self, send_report, events_config=None):
+        """
+        :param send_report: Coroutine function sending the report of an event,
+            called with the event name and configuration.
+        """
+        self.send_report = send_report
+        self.events_config = events_config or EVENTS_CONFIG
+        self.next_run = {}
+
+    def active_events(self):
+        return {event_name: event_config for event_name, event_config in self.events_config.items()
+                if event_config['active']}
+
+    def load(self):
+        """Schedules every active event from its last stored send time."""
+        session = Session()
+        try:
+            for event_name, event_config in self.active_events().items():
+                last_sent_at = ReportState.get_last_sent_at(session, event_name)
+                self.next_run[event_name] = last_sent_at + timedelta(
+                    hours=event_config['report_interval_hours']) if last_sent_at else datetime.utcnow()
+        finally:
+            session.close()
+
+    def save(self, event_name, sent_at):
+        """Stores the send time of a report."""
+        session = Session()
+        try:
+            ReportState.set_last_sent_at(session, event_name, sent_at)
+        finally:
+            session.close()
+
+    async def run(self):
+        """Runs the schedule until the task is cancelled."""
+        await asyncio.to_thread(self.load)
+        logger.telegram.info(
+            f"Report scheduler started for {', '.join(self.next_run)}.")
+        while True:
+            await self.run_due(datetime.utcnow())
+            await asyncio.sleep(self.seconds_until_next_run(datetime.utcnow()))
+
+    async def run_due(self, now):
+        """Sends the reports that are due and schedules their next run."""
+        for event_name, event_config in self.active_events().items():
+            if self.next_run.get(event_name, now) > now:
+                continue
+            try:
+                await self.send_report(event_name, event_config)
+                await asyncio.to_thread(self.save, event_name, now)
+                self.next_run[event_name] = now + timedelta(
+                    hours=event_config['report_interval_hours'])
+            except Exception as e:
+                logger.telegram.error(
+                    f"Failed to send scheduled report for {event_name}, retrying later: {e}", exc_info=True)
+                self.next_run[event_name] = now + timedelta(
+                    seconds=REPORT_SCHEDULER_CONFIG['retry_seconds'])
+
+    def seconds_until_next_run(self, now):
+        """Returns how long to sleep until the next report is due."""
+        wait = REPORT_SCHEDULER_CONFIG['max_sleep_seconds']
+        for next_run in self.next_run.values():
+            wait = min(wait, (next_run - now).total_seconds())
+        return max(wait, 0)
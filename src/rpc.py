@@ -0,0 +1,322 @@
+import asyncio
+import json
+import random
+import time
+from threading import Lock
+import requests
+from aiohttp import ClientConnectionError, ClientSession, ClientTimeout, TCPConnector
+from requests.adapters import HTTPAdapter
+from web3 import Web3, AsyncWeb3
+from web3.middleware import geth_poa_middleware, async_geth_poa_middleware
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.providers.base import JSONBaseProvider
+from .config import ETH_NODE_URLS, RPC_BATCH_SIZE, RPC_CONFIG
+from .logging_config import logger
+
+# Fragments of JSON-RPC error messages that mean the provider throttled us
+RATE_LIMIT_ERRORS = (
+    "rate limit",
+    "too many requests",
+    "request rate",
+    "capacity exceeded",
+    "daily request count exceeded",
+)
+
+
+class RetryableRPCError(Exception):
+    """Raised when an endpoint is throttling or failing and the request can be retried."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Endpoint:
+    """
+    An RPC endpoint with a health score. Failures lower the score and put the
+    endpoint in cooldown, successes slowly restore it.
+    """
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.score = 1.0
+        self.available_at = 0.0
+
+    def succeeded(self):
+        self.score = min(1.0, self.score + 0.1)
+
+    def failed(self, cooldown_seconds):
+        self.score /= 2
+        self.available_at = time.monotonic() + cooldown_seconds
+
+
+class FailoverHTTPProvider(JSONBaseProvider):
+    """
+    HTTP provider sending requests over a pooled keep-alive session to the
+    healthiest of several endpoints. Rate limited, unreachable or failing
+    endpoints are backed off exponentially and the request fails over to the
+    next endpoint.
+    """
+
+    def __init__(self, endpoint_uris):
+        super().__init__()
+        if not endpoint_uris:
+            raise ValueError("At least one RPC endpoint is required")
+        self.endpoints = [Endpoint(uri) for uri in endpoint_uris]
+        self.lock = Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(endpoint_uris),
+                              pool_maxsize=RPC_CONFIG['pool_size'])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __str__(self):
+        return f"RPC connection {', '.join(endpoint.uri for endpoint in self.endpoints)}"
+
+    def make_request(self, method, params):
+        return self.post(self.encode_rpc_request(method, params))
+
+    def make_batch_request(self, payload):
+        """
+        Sends a list of JSON-RPC request objects in one HTTP request.
+
+        :return: The decoded response body.
+        """
+        return self.post(json.dumps(payload).encode())
+
+    def is_connected(self, show_traceback=False):
+        try:
+            self.make_request('web3_clientVersion', [])
+            return True
+        except Exception:
+            if show_traceback:
+                raise
+            return False
+
+    def choose_endpoint(self):
+        """Returns the healthiest endpoint, waiting if all of them are cooling down."""
+        with self.lock:
+            now = time.monotonic()
+            available = [endpoint for endpoint in self.endpoints
+                         if endpoint.available_at <= now]
+            if available:
+                return max(available, key=lambda endpoint: endpoint.score)
+            endpoint = min(self.endpoints, key=lambda endpoint: endpoint.available_at)
+        time.sleep(endpoint.available_at - now)
+        return endpoint
+
+    def post(self, data):
+        """
+        Posts an encoded request, retrying throttled or failed attempts with
+        exponential backoff across the endpoints.
+
+        :return: The decoded response body.
+        """
+        attempt = 0
+        while True:
+            endpoint = self.choose_endpoint()
+            try:
+                response = self.session.post(
+                    endpoint.uri, data=data, headers={'Content-Type': 'application/json'},
+                    timeout=RPC_CONFIG['timeout'])
+                body = check_response(response)
+                with self.lock:
+                    endpoint.succeeded()
+                return body
+            # ConnectTimeout is also a Timeout, but an unreachable endpoint is
+            # failed over like any connection error, so it is caught first
+            except (requests.ConnectTimeout, requests.ConnectionError, RetryableRPCError) as e:
+                attempt += 1
+                backoff = min(RPC_CONFIG['backoff_seconds'] * 2 ** (attempt - 1),
+                              RPC_CONFIG['max_backoff_seconds'])
+                cooldown = getattr(e, 'retry_after', None) or backoff * random.uniform(0.5, 1.5)
+                with self.lock:
+                    endpoint.failed(cooldown)
+                if attempt > RPC_CONFIG['max_retries']:
+                    raise
+                logger.warning(
+                    f"RPC endpoint {endpoint.uri} failed, retrying in {cooldown:.1f}s (attempt {attempt}): {e}")
+            except requests.Timeout:
+                # Slow ranges are shrunk by the caller, so read timeouts are not retried
+                with self.lock:
+                    endpoint.failed(0)
+                raise
+
+
+class AsyncFailoverHTTPProvider(AsyncJSONBaseProvider):
+    """
+    Asyncio counterpart of FailoverHTTPProvider for AsyncWeb3, with the same
+    endpoint scores, exponential backoff and failover. Requests are sent over
+    the aiohttp session passed to cache_async_session.
+    """
+
+    def __init__(self, endpoint_uris):
+        super().__init__()
+        if not endpoint_uris:
+            raise ValueError("At least one RPC endpoint is required")
+        self.endpoints = [Endpoint(uri) for uri in endpoint_uris]
+        self.session = None
+
+    def __str__(self):
+        return f"RPC connection {', '.join(endpoint.uri for endpoint in self.endpoints)}"
+
+    async def cache_async_session(self, session):
+        """Adopts a session unless an open one is already in use, and returns the one in use."""
+        if self.session is None or self.session.closed:
+            self.session = session
+        return self.session
+
+    async def make_request(self, method, params):
+        return await self.post(self.encode_rpc_request(method, params))
+
+    async def choose_endpoint(self):
+        """Returns the healthiest endpoint, waiting if all of them are cooling down."""
+        now = time.monotonic()
+        available = [endpoint for endpoint in self.endpoints if endpoint.available_at <= now]
+        if available:
+            return max(available, key=lambda endpoint: endpoint.score)
+        endpoint = min(self.endpoints, key=lambda endpoint: endpoint.available_at)
+        await asyncio.sleep(endpoint.available_at - now)
+        return endpoint
+
+    async def post(self, data):
+        """
+        Posts an encoded request, retrying throttled or failed attempts with
+        exponential backoff across the endpoints.
+
+        :return: The decoded response body.
+        """
+        if self.session is None:
+            raise RuntimeError("open_async_session must be called before sending requests")
+        # A connect timeout raises ServerTimeoutError, a connection error that
+        # is failed over, while a slow response exceeds the total timeout
+        timeout = ClientTimeout(total=RPC_CONFIG['timeout'], sock_connect=RPC_CONFIG['timeout'])
+        attempt = 0
+        while True:
+            endpoint = await self.choose_endpoint()
+            try:
+                async with self.session.post(
+                        endpoint.uri, data=data, headers={'Content-Type': 'application/json'},
+                        timeout=timeout) as response:
+                    body = await check_async_response(response)
+                endpoint.succeeded()
+                return body
+            except (ClientConnectionError, RetryableRPCError) as e:
+                attempt += 1
+                backoff = min(RPC_CONFIG['backoff_seconds'] * 2 ** (attempt - 1),
+                              RPC_CONFIG['max_backoff_seconds'])
+                cooldown = getattr(e, 'retry_after', None) or backoff * random.uniform(0.5, 1.5)
+                endpoint.failed(cooldown)
+                if attempt > RPC_CONFIG['max_retries']:
+                    raise
+                logger.warning(
+                    f"RPC endpoint {endpoint.uri} failed, retrying in {cooldown:.1f}s (attempt {attempt}): {e}")
+            except asyncio.TimeoutError:
+                # Slow ranges are shrunk by the caller, so read timeouts are not retried
+                endpoint.failed(0)
+                raise
+
+
+def check_status(status_code, headers):
+    """Raises RetryableRPCError for throttled or failing HTTP statuses."""
+    if status_code == 429 or status_code >= 500:
+        retry_after = headers.get('Retry-After')
+        raise RetryableRPCError(
+            f"HTTP {status_code}",
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+
+def check_body(body):
+    """
+    Raises RetryableRPCError if a JSON-RPC response or any response of a batch
+    is a rate limit error.
+
+    :return: The body.
+    """
+    for item in body if isinstance(body, list) else [body]:
+        message = str(item.get('error', {}).get('message', '')).lower() if isinstance(item, dict) else ''
+        if any(fragment in message for fragment in RATE_LIMIT_ERRORS):
+            raise RetryableRPCError(message)
+    return body
+
+
+def check_response(response):
+    """
+    Decodes a JSON-RPC response body, raising RetryableRPCError for throttled
+    or failing responses.
+
+    :return: The decoded response body.
+    """
+    check_status(response.status_code, response.headers)
+    response.raise_for_status()
+    return check_body(response.json())
+
+
+async def check_async_response(response):
+    """Decodes an aiohttp JSON-RPC response like check_response."""
+    check_status(response.status, response.headers)
+    response.raise_for_status()
+    return check_body(await response.json(content_type=None))
+
+
+def create_web3(endpoint_uris=None):
+    """Builds a Web3 instance on top of the shared failover provider."""
+    w3 = Web3(FailoverHTTPProvider(endpoint_uris or ETH_NODE_URLS))
+    w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    return w3
+
+
+# Shared web3 connection used by the listener and the parsers
+w3 = create_web3()
+
+
+def create_async_web3(endpoint_uris=None):
+    """Builds an AsyncWeb3 instance on the async failover provider for the asyncio pipeline."""
+    async_w3 = AsyncWeb3(AsyncFailoverHTTPProvider(endpoint_uris or ETH_NODE_URLS))
+    async_w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+    return async_w3
+
+
+async def open_async_session(async_w3):
+    """
+    Caches a keep-alive aiohttp session for the provider of an AsyncWeb3
+    instance. Its connection pool bounds the number of concurrent requests.
+    Must be called from the event loop that uses the instance.
+
+    :return: The session used by the provider, to be closed by the caller.
+    """
+    session = ClientSession(connector=TCPConnector(limit=RPC_CONFIG['pool_size']))
+    cached_session = await async_w3.provider.cache_async_session(session)
+    if cached_session is not session:
+        # The provider keeps a session it already uses
+        await session.close()
+    return cached_session
+
+
+def batch_request(w3, calls):
+    """
+    Sends JSON-RPC calls to the node of a Web3 instance as batch requests.
+
+    :param w3: Web3 instance using a FailoverHTTPProvider.
+    :param calls: List of (method, params) tuples.
+    :return: List of raw results in the same order as the calls.
+    """
+    results = []
+    for offset in range(0, len(calls), RPC_BATCH_SIZE):
+        page = calls[offset:offset + RPC_BATCH_SIZE]
+        payload = [{'jsonrpc': '2.0', 'id': index, 'method': method, 'params': params}
+                   for index, (method, params) in enumerate(page)]
+        body = w3.provider.make_batch_request(payload)
+        if isinstance(body, dict):
+            # Providers answer a rejected batch with a single error object
+            raise ValueError(body.get('error', body))
+
+        responses = {item['id']: item for item in body}
+        for index, (method, _) in enumerate(page):
+            item = responses.get(index)
+            if item is None or 'error' in item:
+                raise ValueError(
+                    f"Batch call {method} failed: {item['error'] if item else 'missing response'}")
+            results.append(item['result'])
+        logger.info(f"JSON-RPC batch of {len(page)} calls completed.")
+    return results
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from datetime import timedelta
+from telegram.error import RetryAfter, ChatMigrated, BadRequest, TimedOut, NetworkError
+from .config import TELEGRAM_DELIVERY_CONFIG
+from .logging_config import logger
+
+
+class DeliveryRateLimiter:
+    """
+    Spaces messages to stay within Telegram's global rate and its per chat
+    rate. Slots are reserved in order, so concurrent senders never exceed
+    either limit.
+    """
+
+    def __init__(self, messages_per_second=None, chat_interval_seconds=None):
+        self.global_interval = 1 / (messages_per_second or TELEGRAM_DELIVERY_CONFIG['messages_per_second'])
+        self.chat_interval = chat_interval_seconds or TELEGRAM_DELIVERY_CONFIG['chat_interval_seconds']
+        self.next_global = 0.0
+        self.next_chat = {}
+
+    def reserve(self, chat_id, now=None):
+        """
+        Reserves the next free slot for a message to a chat.
+
+        :return: Seconds to wait before sending.
+        """
+        now = time.monotonic() if now is None else now
+        start = max(now, self.next_global, self.next_chat.get(chat_id, 0.0))
+        self.next_global = start + self.global_interval
+        self.next_chat[chat_id] = start + self.chat_interval
+        return start - now
+
+    def pause(self, chat_id, seconds, now=None):
+        """Holds back a chat that Telegram asked to retry later."""
+        now = time.monotonic() if now is None else now
+        self.next_chat[chat_id] = max(self.next_chat.get(chat_id, 0.0), now + seconds)
+
+
+class TelegramDeliveryQueue:
+    """
+    Queue sending messages to many chats concurrently with a pool of workers.
+    Each message is retried on its own: flood limited chats are held back for
+    the RetryAfter delay without blocking a worker, network errors are retried
+    with exponential backoff and rejected messages are given up.
+
+    Use it as an async context manager or call start() and stop().
+    """
+
+    def __init__(self, bot, workers=None, rate_limiter=None, max_retries=None, backoff_seconds=None):
+        self.bot = bot
+        self.workers = workers or TELEGRAM_DELIVERY_CONFIG['workers']
+        self.rate_limiter = rate_limiter or DeliveryRateLimiter()
+        self.max_retries = TELEGRAM_DELIVERY_CONFIG['max_retries'] if max_retries is None else max_retries
+        self.backoff_seconds = backoff_seconds or TELEGRAM_DELIVERY_CONFIG['backoff_seconds']
+        self.queue = asyncio.Queue()
+        self.tasks = []
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def start(self):
+        """Starts the workers on the running event loop."""
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancels the workers, messages still queued are not sent."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def broadcast(self, chat_ids, text, **kwargs):
+        """
+        Sends a message to several chats and waits until every delivery has
+        succeeded or was given up.
+
+        :param kwargs: Further arguments of Bot.send_message, e.g. parse_mode.
+        :return: List of the chat ids the message could not be delivered to.
+        """
+        loop = asyncio.get_running_loop()
+        deliveries = []
+        for chat_id in chat_ids:
+            delivered = loop.create_future()
+            deliveries.append(delivered)
+            self.queue.put_nowait({'chat_id': chat_id, 'text': text, 'kwargs': kwargs,
+                                   'attempt': 0, 'delivered': delivered})
+        results = await asyncio.gather(*deliveries)
+        return [chat_id for chat_id, result in zip(chat_ids, results) if not result]
+
+    async def worker(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.deliver(message)
+            except Exception as e:
+                logger.telegram.error(
+                    f"Unexpected error delivering to {message['chat_id']}: {e}", exc_info=True)
+                self.finish(message, False)
+            finally:
+                self.queue.task_done()
+
+    async def deliver(self, message):
+        """Sends one message, requeueing it when it should be retried."""
+        chat_id = message['chat_id']
+        await asyncio.sleep(self.rate_limiter.reserve(chat_id))
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=message['text'], **message['kwargs'])
+            self.finish(message, True)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            logger.telegram.warning(
+                f"Flood limit for chat {chat_id}, retrying in {retry_after}s.")
+            self.rate_limiter.pause(chat_id, retry_after)
+            self.retry(message, retry_after)
+        except ChatMigrated as e:
+            logger.telegram.warning(
+                f"Chat {chat_id} migrated to {e.new_chat_id}, resending there.")
+            self.retry(dict(message, chat_id=e.new_chat_id), 0)
+        except BadRequest as e:
+            logger.telegram.error(f"Message to chat {chat_id} rejected: {e}")
+            self.finish(message, False)
+        except (TimedOut, NetworkError) as e:
+            delay = self.backoff_seconds * 2 ** message['attempt']
+            logger.telegram.warning(
+                f"Sending to chat {chat_id} failed, retrying in {delay}s: {e}")
+            self.retry(message, delay)
+        except Exception as e:
+            # Forbidden, InvalidToken and other errors that a retry cannot fix
+            logger.telegram.error(f"Message to chat {chat_id} could not be delivered: {e}")
+            self.finish(message, False)
+
+    def retry(self, message, delay):
+        """Requeues a message after a delay without holding a worker."""
+        if message['attempt'] >= self.max_retries:
+            logger.telegram.error(
+                f"Giving up on chat {message['chat_id']} after {message['attempt'] + 1} attempts.")
+            self.finish(message, False)
+            return
+        message = dict(message, attempt=message['attempt'] + 1)
+        asyncio.get_running_loop().call_later(delay, self.queue.put_nowait, message)
+
+    @staticmethod
+    def finish(message, delivered):
+        if not message['delivered'].done():
+            message['delivered'].set_result(delivered)
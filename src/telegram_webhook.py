@@ -0,0 +1,75 @@
+import asyncio
+import secrets
+import signal
+from aiohttp import web
+from telegram import Update
+from .config import TELEGRAM_WEBHOOK_CONFIG
+from .logging_config import logger
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def create_webhook_app(application, path, secret_token=None):
+    """
+    Creates the aiohttp app receiving updates from Telegram. Updates are put
+    on the application's update queue, so the request returns immediately and
+    handlers run concurrently.
+
+    :param application: The telegram.ext.Application processing the updates.
+    :param path: The URL path Telegram posts updates to.
+    :param secret_token: Token Telegram sends in every request, checked if set.
+    """
+    async def handle_update(request):
+        if secret_token and not secrets.compare_digest(
+                request.headers.get(SECRET_TOKEN_HEADER, ''), secret_token):
+            logger.telegram.warning(
+                f"Rejected webhook request from {request.remote} with an invalid secret token.")
+            return web.Response(status=403)
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception as e:
+            logger.telegram.error(f"Invalid webhook update: {e}")
+            return web.Response(status=400)
+        await application.update_queue.put(update)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+async def run_webhook(application, config=None):
+    """
+    Runs the bot with updates delivered to a local aiohttp server instead of
+    long polling, until SIGINT or SIGTERM. The application's post_init and
+    post_stop callbacks are called as with run_polling, so the report
+    scheduler shares the event loop with the server.
+    """
+    config = config or TELEGRAM_WEBHOOK_CONFIG
+    if not config['url']:
+        raise ValueError("TELEGRAM_WEBHOOK_URL is required in webhook mode")
+    secret_token = config['secret_token'] or secrets.token_urlsafe(32)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner = web.AppRunner(create_webhook_app(application, config['path'], secret_token))
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, config['listen'], config['port']).start()
+            await application.bot.set_webhook(
+                url=config['url'].rstrip('/') + config['path'], secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES)
+            logger.telegram.info(
+                f"Telegram webhook listening on {config['listen']}:{config['port']}{config['path']}.")
+            await stop.wait()
+        finally:
+            await runner.cleanup()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
@@ -0,0 +1,75 @@
+import pytest
+import json
+from decimal import Decimal
+from eth_abi import encode
+from hexbytes import HexBytes
+from web3 import Web3
+from src.abi_decoder import BatchDecoder, EventDecoder, scale_amount
+
+
+# Test that sliced static words match eth_abi
+def test_batch_decoder_matches_eth_abi():
+    types = ["uint256", "int128", "bool", "address"]
+    rows = [
+        (2 ** 256 - 1, -5, True, "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0"),
+        (0, 2 ** 127 - 1, False, "0x0000000000000000000000000000000000000001"),
+    ]
+    decoder = BatchDecoder(types)
+
+    decoded = decoder.decode([encode(types, list(row)) for row in rows])
+
+    assert decoder.word_decoders is not None
+    assert decoded[0] == rows[0]
+    assert decoded[1] == (0, 2 ** 127 - 1, False, "0x0000000000000000000000000000000000000001")
+
+
+# Test that malformed payloads are reported without failing the page
+def test_batch_decoder_rejects_malformed_payloads():
+    decoder = BatchDecoder(["uint8", "uint256"])
+
+    decoded = decoder.decode([
+        encode(["uint256", "uint256"], [256, 1]),
+        encode(["uint256"], [1]),
+        encode(["uint8", "uint256"], [255, 1]).hex(),
+    ])
+
+    assert decoded == [None, None, (255, 1)]
+
+
+# Test that dynamic layouts fall back to eth_abi
+def test_batch_decoder_falls_back_for_dynamic_types():
+    decoder = BatchDecoder(["string", "uint256"])
+
+    decoded = decoder.decode([encode(["string", "uint256"], ["AIX", 7])])
+
+    assert decoder.word_decoders is None
+    assert decoded == [("AIX", 7)]
+
+
+# Test that token amounts are scaled without rounding
+def test_scale_amount_is_exact():
+    assert scale_amount(2 ** 256 - 1) == Decimal(2 ** 256 - 1) / Decimal(10 ** 18)
+    assert scale_amount(123456789012345678901) == Decimal("123.456789012345678901")
+    assert scale_amount(5, decimals=6) == Decimal("0.000005")
+
+
+# Test that an event decoder is compiled from the configured ABI and topic
+def test_event_decoder_from_abi_decodes_topics_and_data():
+    abi = [{"anonymous": False, "name": "Transfer", "type": "event", "inputs": [
+        {"indexed": True, "name": "from", "type": "address"},
+        {"indexed": True, "name": "to", "type": "address"},
+        {"indexed": False, "name": "value", "type": "uint256"}]}]
+    topic0 = Web3.keccak(text="Transfer(address,address,uint256)").hex()
+    sender = "0x" + "11" * 20
+    receiver = "0x" + "22" * 20
+
+    decoder = EventDecoder.from_abi(json.dumps(abi), topic0)
+    decoded = decoder.decode([{
+        'topics': [HexBytes(topic0), HexBytes("0x" + "00" * 12 + "11" * 20), HexBytes("0x" + "00" * 12 + "22" * 20)],
+        'data': HexBytes(encode(["uint256"], [10 ** 18])),
+    }])
+
+    assert decoded == [{'from': Web3.to_checksum_address(sender),
+                        'to': Web3.to_checksum_address(receiver), 'value': 10 ** 18}]
+    with pytest.raises(ValueError):
+        EventDecoder.from_abi(abi, "0x" + "00" * 32)
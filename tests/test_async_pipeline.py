@@ -0,0 +1,87 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+from hexbytes import HexBytes
+from src.async_pipeline import IngestionPipeline
+
+events_config = {
+    "TotalDistribution": {
+        "address": "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0",
+        "topics": ["0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694"],
+    }
+}
+
+
+def make_log(block_number):
+    return {
+        'address': "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0",
+        'topics': [HexBytes("0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694")],
+        'blockNumber': block_number,
+    }
+
+
+class FakeParser:
+    async def parse_events_async(self, events, event_config, async_w3):
+        return [{'blockNumber': event['blockNumber']} for event in events]
+
+
+@pytest.mark.asyncio
+@patch('src.async_pipeline.open_async_session', new_callable=AsyncMock)
+@patch('src.async_pipeline.get_event_parser', return_value=FakeParser())
+@patch('src.async_pipeline.save_windows')
+async def test_pipeline_writes_windows_in_order(mock_save_windows, mock_get_parser, mock_open_session):
+    """Test that every window is enriched and stored in block order, shrinking rejected ranges."""
+    async def get_logs(log_filter):
+        if log_filter['toBlock'] - log_filter['fromBlock'] >= 100:
+            raise ValueError("query returned more than 10000 results")
+        return [make_log(log_filter['fromBlock'])]
+
+    async_w3 = SimpleNamespace(eth=SimpleNamespace(get_logs=get_logs))
+    pipeline = IngestionPipeline(events_config, async_w3, queue_size=2)
+    with patch('src.backfill.BACKFILL_CONFIG', {'initial_window': 400, 'min_window': 10,
+                                               'max_window': 400, 'target_seconds': 0}):
+        last_block = await pipeline.run(1000, 1399)
+
+    assert last_block == 1399
+    window_ends = [call.args[1] for call in mock_save_windows.call_args_list]
+    assert window_ends == sorted(window_ends), "Windows must be written in block order."
+    assert window_ends[-1] == 1399
+    stored_blocks = [event['blockNumber'] for call in mock_save_windows.call_args_list
+                     for event in call.args[0]["TotalDistribution"]]
+    assert stored_blocks == [window_end - 99 for window_end in window_ends]
+
+
+@pytest.mark.asyncio
+@patch('src.async_pipeline.open_async_session', new_callable=AsyncMock)
+@patch('src.async_pipeline.get_event_parser', return_value=FakeParser())
+@patch('src.async_pipeline.save_windows', side_effect=RuntimeError("database is down"))
+async def test_pipeline_stops_on_write_error(mock_save_windows, mock_get_parser, mock_open_session):
+    """Test that a failing writer stops the pipeline at the last stored block."""
+    async def get_logs(log_filter):
+        return [make_log(log_filter['fromBlock'])]
+
+    async_w3 = SimpleNamespace(eth=SimpleNamespace(get_logs=get_logs))
+    pipeline = IngestionPipeline(events_config, async_w3, queue_size=1)
+    last_block = await pipeline.run(1000, 100000)
+
+    assert last_block == 999
+    mock_save_windows.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch('src.async_pipeline.open_async_session', new_callable=AsyncMock)
+@patch('src.async_pipeline.get_event_parser', return_value=FakeParser())
+@patch('src.async_pipeline.save_windows')
+async def test_pipeline_reuses_session_across_restarts(mock_save_windows, mock_get_parser, mock_open_session):
+    """Test that restarts reuse the aiohttp session opened by the first run until the pipeline is closed."""
+    async def get_logs(log_filter):
+        return []
+
+    async_w3 = SimpleNamespace(eth=SimpleNamespace(get_logs=get_logs))
+    pipeline = IngestionPipeline(events_config, async_w3)
+    await pipeline.run(1000, 1099)
+    await pipeline.run(1100, 1199)
+
+    mock_open_session.assert_awaited_once_with(async_w3)
+    await pipeline.close()
+    mock_open_session.return_value.close.assert_awaited_once()
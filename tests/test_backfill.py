@@ -0,0 +1,52 @@
+import pytest
+import requests
+from src.backfill import AdaptiveWindow, is_range_limit_error
+from src.rpc import RetryableRPCError
+
+
+def test_window_grows_after_fast_response():
+    """Test that the window doubles after a response faster than the target."""
+    window = AdaptiveWindow(initial=100, minimum=10, maximum=1000, target_seconds=2)
+    window.succeeded(0.5)
+    assert window.size == 200
+    window.succeeded(5)
+    assert window.size == 200, "Slow responses should not grow the window."
+
+
+def test_window_is_capped_at_maximum():
+    """Test that the window never grows past the configured maximum."""
+    window = AdaptiveWindow(initial=800, minimum=10, maximum=1000, target_seconds=2)
+    window.succeeded(0.1)
+    assert window.size == 1000
+
+
+def test_window_shrinks_until_minimum():
+    """Test that failures halve the window until the minimum is reached."""
+    window = AdaptiveWindow(initial=40, minimum=10, maximum=1000, target_seconds=2)
+    assert window.failed() is True
+    assert window.size == 20
+    assert window.failed() is True
+    assert window.size == 10
+    assert window.failed() is False, "Window at its minimum cannot shrink."
+
+
+def test_next_range_is_clamped_to_end_block():
+    """Test that the last window stops at the requested end block."""
+    window = AdaptiveWindow(initial=100, minimum=10, maximum=1000, target_seconds=2)
+    assert window.next_range(1000, 5000) == (1000, 1099)
+    assert window.next_range(4950, 5000) == (4950, 5000)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (ValueError({'code': -32005, 'message': 'query returned more than 10000 results'}), True),
+    (Exception("Log response size exceeded."), True),
+    (TimeoutError(), True),
+    (ValueError("execution reverted"), False),
+    (requests.ConnectTimeout("Connection to node timed out"), False),
+    (requests.ReadTimeout("Read timed out"), True),
+    (ValueError({'code': -32005, 'message': 'Rate limit exceeded'}), False),
+    (RetryableRPCError("HTTP 429 from https://node"), False),
+])
+def test_is_range_limit_error(error, expected):
+    """Test detection of provider errors that call for a smaller range."""
+    assert is_range_limit_error(error) is expected
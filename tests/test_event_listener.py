@@ -1,8 +1,10 @@
 import pytest
-from unittest.mock import patch
+import time
+from unittest.mock import patch, PropertyMock
 from web3 import Web3
+from hexbytes import HexBytes
 from web3.middleware import geth_poa_middleware
-from src.event_listener import fetch_and_process_events, save_event_in_db
+from src.event_listener import fetch_and_process_events, parallel_fetch_and_process_events, route_logs, save_event_in_db, HeadTracker, BlockHashWindow, confirmed_block, listen_for_events, iter_log_pages, save_window
 from src.models import Event, Session
 
 # Setup a mock Web3 provider
@@ -60,4 +62,213 @@ def test_save_event_in_db():
         result_duplicate = Event.insert_event(session, event_name, event_data)
 
         # Assert that the duplicate event was not inserted
-        assert result_duplicate is False
\ No newline at end of file
+        assert result_duplicate is False
+
+# Test that a rejected range is retried with a smaller window
+def test_fetch_and_process_events_shrinks_window():
+    event_config = {
+        "address": "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0",
+        "topics": ["0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694"],
+    }
+    requested_ranges = []
+
+    def get_logs(params):
+        requested_ranges.append((params['fromBlock'], params['toBlock']))
+        if params['toBlock'] - params['fromBlock'] >= 1000:
+            raise ValueError("query returned more than 10000 results")
+        return []
+
+    with patch('src.event_listener.w3') as mock_w3, \
+            patch('src.event_listener.parse_events', return_value=[]), \
+            patch('src.event_listener.save_window') as mock_save_window:
+        mock_w3.eth.get_logs.side_effect = get_logs
+        last_block = fetch_and_process_events(
+            "TotalDistribution", event_config, 0, 1999)
+
+    assert last_block == 1999
+    assert requested_ranges[0] == (0, 1999)
+    assert requested_ranges[1] == (0, 999)
+    mock_save_window.assert_called_with("TotalDistribution", [], 1999)
+
+
+# Test that a rate-limited request is not retried with a smaller window
+def test_fetch_and_process_events_keeps_window_on_rate_limit():
+    event_config = {
+        "address": "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0",
+        "topics": ["0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694"],
+    }
+
+    with patch('src.event_listener.w3') as mock_w3, \
+            patch('src.event_listener.save_window') as mock_save_window:
+        mock_w3.eth.get_logs.side_effect = ValueError({'code': -32005, 'message': 'Rate limit exceeded'})
+        last_block = fetch_and_process_events("TotalDistribution", event_config, 0, 1999)
+
+    assert last_block == -1
+    mock_w3.eth.get_logs.assert_called_once()
+    mock_save_window.assert_not_called()
+
+
+# Test that a window is yielded in bounded pages checkpointed before the next page
+def test_iter_log_pages_splits_windows():
+    def get_logs(params):
+        return [{'blockNumber': block_number}
+                for block_number in (params['fromBlock'], params['fromBlock'] + 5, params['fromBlock'] + 5)]
+
+    with patch('src.event_listener.w3') as mock_w3, \
+            patch.dict('src.event_listener.BACKFILL_CONFIG', {'initial_window': 100}), \
+            patch.dict('src.backfill.BACKFILL_CONFIG', {'initial_window': 100, 'max_window': 100}):
+        mock_w3.eth.get_logs.side_effect = get_logs
+        pages = iter_log_pages({"TotalDistribution": {}}, {}, 0, 149, page_size=2)
+        assert next(pages) == ([{'blockNumber': 0}, {'blockNumber': 5}], 4)
+        assert mock_w3.eth.get_logs.call_count == 1, "Windows must be fetched lazily."
+        pages = list(pages)
+
+    assert [block_number for _, block_number in pages] == [99, 104, 149]
+    assert pages[0][0] == [{'blockNumber': 5}]
+
+
+# Test that windows fetched in parallel are written in block order
+def test_parallel_fetch_and_process_events_writes_in_order():
+    event_config = {
+        "address": "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0",
+        "topics": ["0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694"],
+    }
+
+    def get_logs(params):
+        # Earlier windows answer slower so that fetches finish out of order
+        time.sleep(0.01 * (3 - params['fromBlock'] // 100))
+        return [{'blockNumber': params['fromBlock'], 'address': event_config['address'],
+                 'topics': [HexBytes(event_config['topics'][0])]}]
+
+    with patch('src.event_listener.w3') as mock_w3, \
+            patch.dict('src.backfill.BACKFILL_CONFIG', {'initial_window': 100, 'max_window': 100}), \
+            patch('src.event_listener.parse_events', side_effect=lambda name, config, events: events), \
+            patch('src.event_listener.save_window') as mock_save_window:
+        mock_w3.eth.get_logs.side_effect = get_logs
+        last_block = parallel_fetch_and_process_events(
+            {"TotalDistribution": event_config}, 0, 349, workers=4)
+
+    assert last_block == 349
+    written_blocks = [call.args[1][0]['blockNumber']
+                      for call in mock_save_window.call_args_list]
+    assert written_blocks == [0, 100, 200, 300]
+    assert [call.args[2] for call in mock_save_window.call_args_list] == [99, 199, 299, 349]
+
+
+# Test that parallel windows are sized by a window shared with the workers
+def test_parallel_fetch_and_process_events_learns_window_size():
+    requested_ranges = []
+    rejected_ranges = []
+
+    def get_logs(params):
+        if params['toBlock'] - params['fromBlock'] >= 100:
+            rejected_ranges.append((params['fromBlock'], params['toBlock']))
+            raise ValueError("query returned more than 10000 results")
+        requested_ranges.append((params['fromBlock'], params['toBlock']))
+        return []
+
+    with patch('src.event_listener.w3') as mock_w3, \
+            patch.dict('src.backfill.BACKFILL_CONFIG', {'initial_window': 400, 'min_window': 10,
+                                                        'max_window': 400, 'target_seconds': 0}), \
+            patch('src.event_listener.save_window') as mock_save_window:
+        mock_w3.eth.get_logs.side_effect = get_logs
+        last_block = parallel_fetch_and_process_events({"TotalDistribution": {
+            "address": "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0",
+            "topics": ["0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694"],
+        }}, 0, 3999, workers=2)
+
+    assert last_block == 3999
+    assert sorted(requested_ranges) == [(start, start + 99) for start in range(0, 4000, 100)]
+    # Only the windows submitted before the first rejections are rejected
+    assert len(rejected_ranges) <= 8
+    checkpoints = [call.args[2] for call in mock_save_window.call_args_list]
+    assert checkpoints == sorted(checkpoints) and checkpoints[-1] == 3999
+
+
+# Test that a page with events that failed to parse is not checkpointed
+def test_save_window_does_not_checkpoint_failed_events():
+    with patch('src.event_listener.Event.insert_events', return_value=(1, 0)) as mock_insert, \
+            patch('src.event_listener.SyncState.set_last_block_number') as mock_checkpoint:
+        with pytest.raises(ValueError):
+            save_window("TotalDistribution", [{'blockNumber': 10}, {}], 20)
+        mock_insert.assert_not_called()
+        mock_checkpoint.assert_not_called()
+
+        # Undecodable payloads are skipped
+        save_window("TotalDistribution", [{'blockNumber': 10}, None], 20)
+        assert mock_insert.call_args.args[2] == [{'blockNumber': 10}]
+        mock_checkpoint.assert_called_once()
+        assert mock_checkpoint.call_args.args[2] == 20
+
+
+# Test that logs of a combined query are routed to their events
+def test_route_logs_by_address_and_topic():
+    events_config = {
+        "TotalDistribution": {
+            "address": "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0",
+            "topics": ["0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694"],
+        },
+        "OtherDistribution": {
+            "address": "0x0000000000000000000000000000000000000001",
+            "topics": ["0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694"],
+        },
+    }
+    total_log = {'address': "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0",
+                 'topics': [HexBytes(events_config["TotalDistribution"]["topics"][0])]}
+    other_log = {'address': "0x0000000000000000000000000000000000000001",
+                 'topics': [HexBytes(events_config["OtherDistribution"]["topics"][0])]}
+    unknown_log = {'address': "0x0000000000000000000000000000000000000002",
+                   'topics': [HexBytes(events_config["OtherDistribution"]["topics"][0])]}
+
+    routed_logs = route_logs(events_config, [total_log, other_log, unknown_log])
+
+    assert routed_logs == {"TotalDistribution": [total_log], "OtherDistribution": [other_log]}
+
+
+# Test that the head tracker learns the block time and schedules the next poll
+def test_head_tracker_estimates_block_time():
+    head_tracker = HeadTracker(block_time=12)
+    head_tracker.update(100, now=0)
+    head_tracker.update(100, now=6)
+    head_tracker.update(102, now=8)
+
+    assert head_tracker.head == 102
+    assert head_tracker.block_time == pytest.approx(0.8 * 12 + 0.2 * 4)
+    assert head_tracker.seconds_until_next_block(now=10) == pytest.approx(head_tracker.block_time - 2)
+    assert head_tracker.seconds_until_next_block(now=100) == 1.0, "Overdue blocks poll at the minimum interval."
+
+
+# Test that the listener skips log queries when no new block arrived
+def test_listen_for_events_skips_unchanged_head():
+    events_config = {"TotalDistribution": {"active": True}}
+    with patch('src.event_listener.w3') as mock_w3, \
+            patch('src.event_listener.fetch_and_process_all_events', return_value=150) as mock_fetch, \
+            patch('src.event_listener.time.sleep', side_effect=[None, None, StopIteration]):
+        type(mock_w3.eth).block_number = PropertyMock(side_effect=[150, 150, 151])
+        with pytest.raises(StopIteration):
+            listen_for_events(101, events_config)
+
+    assert [call.kwargs for call in mock_fetch.call_args_list] == [
+        {'from_block': 101, 'to_block': 150},
+        {'from_block': 151, 'to_block': 151},
+    ]
+
+
+# Test that a changed block hash reports the last block still on the canonical chain
+def test_block_hash_window_finds_fork():
+    block_hashes = BlockHashWindow(size=3)
+    for block_number in [100, 110, 120, 130]:
+        block_hashes.record(block_number, f"0x{block_number}")
+    assert list(block_hashes.hashes) == [110, 120, 130]
+
+    assert block_hashes.find_fork(lambda number: f"0x{number}") is None
+
+    reorged = {120: "0xnew120", 130: "0xnew130"}
+    assert block_hashes.find_fork(lambda number: reorged.get(number, f"0x{number}")) == 110
+    assert list(block_hashes.hashes) == [110]
+
+
+# Test that the configured confirmation depth is kept behind the head
+def test_confirmed_block_uses_deepest_confirmation():
+    events_config = {"A": {"confirmations": 3}, "B": {"confirmations": 12}, "C": {}}
+    assert confirmed_block(events_config, 1000) == 988
@@ -1,14 +1,18 @@
 import pytest
-from unittest.mock import patch
-from src.event_parser import TotalDistributionParser
+import time
+from unittest.mock import patch, MagicMock
+from src.event_parser import TotalDistributionParser, BlockTimestampCache, EventParserRegistry, BalanceSnapshotCache, is_archive_unavailable_error
 from decimal import Decimal
+from datetime import datetime
+from hexbytes import HexBytes
+from web3 import Web3
 
 @pytest.fixture
 def mock_event():
     return {
         'blockNumber': 123456,
-        'blockHash': '0x123abc',
-        'transactionHash': '0xabcd1234',
+        'blockHash': HexBytes('0x' + '12' * 32),
+        'transactionHash': HexBytes('0x' + 'ab' * 32),
         'logIndex': 1,
         'removed': False,
         'data': '0x' + '01' * 32 + '02' * 32 + '03' * 32 + '04' * 32,
@@ -21,29 +25,31 @@ def expected_data():
         'blockNumber': 123456,
         'name': 'TotalDistribution',
         'contractName': 'AIX',
-        'blockHash': '0x123abc',
+        'blockHash': '0x' + '12' * 32,
         'logIndex': 1,
         'removed': False,
         'transactionIndex': 0,
-        'transactionHash': '0xabcd1234',
+        'transactionHash': '0x' + 'ab' * 32,
         'data': {
-            'aix_processed': Decimal('1.157920892373162e+77'),
-            'aix_distributed': Decimal('2.003529309238059e+77'),
-            'eth_bought': Decimal('2.848034883359073e+77'),
-            'eth_distributed': Decimal('3.692540457480087e+77'),
             'distributor_wallet': '0x0',
-            'distributor_balance': Decimal('100')
         },
-        'timestamp': None
+        'timestamp': None,
+        'aixProcessed': int('01' * 32, 16),
+        'aixDistributed': int('02' * 32, 16),
+        'ethBought': int('03' * 32, 16),
+        'ethDistributed': int('04' * 32, 16),
+        'distributorBalance': 100 * 10**18
     }
 
-@patch('src.event_parser.Web3')
+@patch('src.event_parser.balance_cache', BalanceSnapshotCache())
+@patch('src.event_parser.block_timestamp_cache')
+@patch('src.event_parser.w3')
 @patch('src.event_parser.datetime')
-def test_total_distribution_parser(mock_datetime, mock_web3, mock_event, expected_data):
-    # Mock the Web3 and datetime functionalities
-    mock_web3.eth.get_transaction_receipt.return_value = {'from': '0x0'}
-    mock_web3.eth.get_balance.return_value = 100 * 10**18  # Wei
-    mock_web3.eth.get_block.return_value = {'timestamp': 1234567890}
+def test_total_distribution_parser(mock_datetime, mock_w3, mock_timestamp_cache, mock_event, expected_data):
+    # Mock the node lookups and datetime functionalities
+    mock_w3.eth.get_transaction_receipt.return_value = {'from': '0x0'}
+    mock_w3.eth.get_balance.return_value = 100 * 10**18  # Wei
+    mock_timestamp_cache.get.return_value = 1234567890
     mock_datetime.utcfromtimestamp.return_value = None  # Assuming we don't need the actual datetime
 
     # Initialize the parser
@@ -52,12 +58,190 @@ def test_total_distribution_parser(mock_datetime, mock_web3, mock_event, expecte
     # Parse the mock event
     parsed_data = parser.parse_event_data(mock_event, {'db_name': 'TotalDistribution', 'contractName': 'AIX'})
 
-    # Adjust parsed_data for comparison
-    parsed_data['data']['aix_processed'] = Decimal(parsed_data['data']['aix_processed'])
-    parsed_data['data']['aix_distributed'] = Decimal(parsed_data['data']['aix_distributed'])
-    parsed_data['data']['eth_bought'] = Decimal(parsed_data['data']['eth_bought'])
-    parsed_data['data']['eth_distributed'] = Decimal(parsed_data['data']['eth_distributed'])
-    parsed_data['data']['distributor_balance'] = Decimal(parsed_data['data']['distributor_balance'])
-
     # Assert the parsed data matches the expected data
-    assert parsed_data == expected_data, "Parsed data does not match expected data"
\ No newline at end of file
+    assert parsed_data == expected_data, "Parsed data does not match expected data"
+    mock_w3.eth.get_transaction_receipt.assert_called_once_with('0x' + 'ab' * 32)
+    mock_w3.eth.get_balance.assert_called_once_with('0x0', 123456)
+
+@patch('src.event_parser.balance_cache', BalanceSnapshotCache())
+@patch('src.event_parser.block_timestamp_cache')
+@patch('src.event_parser.batch_request')
+def test_total_distribution_parser_batches_lookups(mock_batch_request, mock_timestamp_cache):
+    # Two logs from the same transaction and block share every lookup
+    raw_event = {
+        'blockNumber': 123456,
+        'blockHash': HexBytes('0x' + '12' * 32),
+        'transactionHash': HexBytes('0x' + 'ab' * 32),
+        'logIndex': 1,
+        'removed': False,
+        'data': HexBytes('0x' + '00' * 31 + '01' + '00' * 31 + '02' + '00' * 31 + '03' + '00' * 31 + '04'),
+        'transactionIndex': 0
+    }
+    wallet = '0x' + '11' * 20
+    mock_timestamp_cache.get_many.return_value = {123456: 1234567890}
+    mock_batch_request.side_effect = [
+        [{'from': wallet}],
+        [hex(5 * 10**18)],
+    ]
+
+    parsed_events = TotalDistributionParser().parse_events(
+        [raw_event, dict(raw_event, logIndex=2)], {'db_name': 'TotalDistribution', 'contractName': 'AIX'})
+
+    assert mock_batch_request.call_count == 2
+    assert mock_batch_request.call_args_list[0].args[1] == [
+        ('eth_getTransactionReceipt', [raw_event['transactionHash'].hex()])]
+    assert mock_batch_request.call_args_list[1].args[1] == [
+        ('eth_getBalance', [Web3.to_checksum_address(wallet), hex(123456)])], "Balances are read at the event block."
+    assert mock_timestamp_cache.get_many.call_args.args[0] == [123456]
+    assert len(parsed_events) == 2
+    assert [event['logIndex'] for event in parsed_events] == [1, 2]
+    assert parsed_events[0]['aixProcessed'] == 1
+    assert parsed_events[0]['ethDistributed'] == 4
+    assert parsed_events[0]['data'] == {'distributor_wallet': Web3.to_checksum_address(wallet)}
+    assert parsed_events[0]['distributorBalance'] == 5 * 10**18
+    assert parsed_events[0]['timestamp'] == datetime.utcfromtimestamp(1234567890)
+
+
+# Test that RPC failures are raised and only undecodable payloads are skipped
+@patch('src.event_parser.w3')
+@patch('src.event_parser.block_timestamp_cache')
+@patch('src.event_parser.batch_request', side_effect=TimeoutError("read timed out"))
+def test_parse_events_raises_on_rpc_failure(mock_batch_request, mock_timestamp_cache, mock_w3):
+    raw_event = {
+        'blockNumber': 123456,
+        'blockHash': HexBytes('0x' + '12' * 32),
+        'transactionHash': HexBytes('0x' + 'ab' * 32),
+        'logIndex': 1,
+        'removed': False,
+        'data': HexBytes('0x' + '00' * 128),
+        'transactionIndex': 0
+    }
+    event_config = {'db_name': 'TotalDistribution', 'contractName': 'AIX'}
+    mock_timestamp_cache.get_many.return_value = {123456: 1234567890}
+    mock_timestamp_cache.get.return_value = 1234567890
+    mock_w3.eth.get_transaction_receipt.side_effect = TimeoutError("read timed out")
+
+    with pytest.raises(TimeoutError):
+        TotalDistributionParser().parse_events([raw_event], event_config)
+
+    mock_batch_request.side_effect = [[{'from': '0x' + '11' * 20}], [hex(1)]]
+    parsed_events = TotalDistributionParser().parse_events(
+        [dict(raw_event, data=HexBytes('0x01'))], event_config)
+    assert parsed_events == [None]
+
+
+@patch('src.event_parser.Session')
+@patch('src.event_parser.BlockTimestamp')
+def test_block_timestamp_cache_tiers(mock_block_timestamp, mock_session):
+    # Block 1 is stored in the database, block 2 has to be fetched from the node
+    mock_block_timestamp.get_timestamps.return_value = {1: 100}
+    fetch_missing = MagicMock(return_value={2: 200})
+    cache = BlockTimestampCache(max_size=10)
+
+    assert cache.get_many([1, 2], fetch_missing) == {1: 100, 2: 200}
+    fetch_missing.assert_called_once_with([2])
+    mock_block_timestamp.save_timestamps.assert_called_once_with(
+        mock_session.return_value, {2: 200})
+
+    # Both blocks are now served from memory
+    mock_block_timestamp.get_timestamps.reset_mock()
+    assert cache.get_many([2, 1], fetch_missing) == {1: 100, 2: 200}
+    mock_block_timestamp.get_timestamps.assert_not_called()
+    assert fetch_missing.call_count == 1
+
+
+@patch('src.event_parser.Session')
+@patch('src.event_parser.BlockTimestamp')
+def test_block_timestamp_cache_evicts_least_recently_used(mock_block_timestamp, mock_session):
+    mock_block_timestamp.get_timestamps.return_value = {}
+    cache = BlockTimestampCache(max_size=2)
+
+    cache.get_many([1, 2], lambda numbers: {number: number * 10 for number in numbers})
+    cache.get_many([1], lambda numbers: {})
+    cache.get_many([3], lambda numbers: {3: 30})
+
+    assert list(cache.timestamps) == [1, 3]
+
+
+# Test that a new event only needs a config entry and enriches what it asks for
+@patch('src.event_parser.block_timestamp_cache')
+@patch('src.event_parser.batch_request')
+def test_registry_builds_parser_from_config(mock_batch_request, mock_timestamp_cache):
+    topic0 = Web3.keccak(text="Claimed(address,uint256)").hex()
+    events_config = {"Claimed": {
+        "address": "0x" + "33" * 20,
+        "abi": '[{"anonymous": false, "name": "Claimed", "type": "event", "inputs": [{"indexed": true, "name": "account", "type": "address"}, {"indexed": false, "name": "amount", "type": "uint256"}]}]',
+        "topics": [topic0],
+        "db_name": "Claimed",
+        "contractName": "AIX",
+        "decimals": 18,
+        "enrich": {"sender": "claimer"},
+    }}
+    raw_event = {
+        'blockNumber': 123456,
+        'blockHash': HexBytes('0x' + '12' * 32),
+        'transactionHash': HexBytes('0x' + 'ab' * 32),
+        'logIndex': 1,
+        'removed': False,
+        'topics': [HexBytes(topic0), HexBytes('0x' + '00' * 12 + '44' * 20)],
+        'data': HexBytes('0x' + '00' * 31 + '02'),
+        'transactionIndex': 0
+    }
+    mock_timestamp_cache.get_many.return_value = {123456: 1234567890}
+    mock_batch_request.return_value = [{'from': '0x' + '55' * 20}]
+
+    registry = EventParserRegistry(events_config)
+    parsed_events = registry.get("Claimed").parse_events([raw_event], events_config["Claimed"])
+
+    assert registry.get("Unknown") is None
+    assert list(registry.decoders) == [topic0]
+    mock_batch_request.assert_called_once()
+    assert parsed_events[0]['data'] == {
+        'account': Web3.to_checksum_address('0x' + '44' * 20),
+        'amount': 2e-18,
+        'claimer': Web3.to_checksum_address('0x' + '55' * 20),
+    }
+
+
+def test_balance_snapshot_cache_memoizes_history_and_expires_live():
+    now = time.time()
+    timestamps = {1: now - 7200, 2: now}
+    fetch_missing = MagicMock(side_effect=lambda keys: {key: key[1] * 10 for key in keys})
+    cache = BalanceSnapshotCache(ttl_seconds=60, live_seconds=1800)
+
+    keys = [('0xa', 1), ('0xa', 2), ('0xa', 1)]
+    assert cache.get_many(keys, timestamps, fetch_missing) == {('0xa', 1): 10, ('0xa', 2): 20}
+    fetch_missing.assert_called_once_with([('0xa', 1), ('0xa', 2)])
+    assert ('0xa', 1) in cache.history
+    assert ('0xa', 2) in cache.live
+
+    # The live balance expires, the historical one is kept
+    with patch('src.event_parser.time.time', return_value=now + 120):
+        cache.get_many([('0xa', 1), ('0xa', 2)], timestamps, fetch_missing)
+    assert fetch_missing.call_args.args[0] == [('0xa', 2)]
+
+
+def test_balance_snapshot_cache_falls_back_to_latest():
+    def fetch_missing(keys):
+        if any(block != 'latest' for _, block in keys):
+            raise ValueError("missing trie node")
+        return {key: 7 for key in keys}
+
+    cache = BalanceSnapshotCache(ttl_seconds=60, live_seconds=1800)
+    balances = cache.get_many([('0xa', 1), ('0xa', 2)], {1: 0, 2: 0}, fetch_missing)
+
+    assert balances == {('0xa', 1): 7, ('0xa', 2): 7}
+    assert not cache.history, "Latest balances must not be memoized as historical."
+
+
+def test_balance_snapshot_cache_raises_transient_errors():
+    fetch_missing = MagicMock(side_effect=ValueError("Batch call eth_getBalance failed: 429 Too Many Requests"))
+    cache = BalanceSnapshotCache(ttl_seconds=60, live_seconds=1800)
+
+    with pytest.raises(ValueError):
+        cache.get_many([('0xa', 1)], {1: 0}, fetch_missing)
+
+    fetch_missing.assert_called_once_with([('0xa', 1)])
+    assert not cache.history and not cache.live
+    assert is_archive_unavailable_error(ValueError("header not found"))
+    assert not is_archive_unavailable_error(TimeoutError("read timed out"))
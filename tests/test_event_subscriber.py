@@ -0,0 +1,148 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from hexbytes import HexBytes
+from src.event_subscriber import handle_log, run_subscription
+from src.event_listener import BlockHashWindow
+
+raw_log = {
+    'address': '0xabe235136562a5c2b02557e1cae7e8c85f2a5da0',
+    'blockHash': '0x' + '12' * 32,
+    'blockNumber': hex(19600000),
+    'data': '0x' + '00' * 128,
+    'logIndex': '0x1',
+    'removed': False,
+    'topics': ['0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694'],
+    'transactionHash': '0x' + 'ab' * 32,
+    'transactionIndex': '0x0',
+}
+
+
+events_config = {
+    "TotalDistribution": {
+        "address": "0xaBE235136562a5C2B02557E1CaE7E8c85F2a5da0",
+        "topics": ["0xe689c8111f40a171596b9d81ac47c6fe406d2297392957c5126c2f7448c58694"],
+    }
+}
+
+
+@patch('src.event_subscriber.fetch_and_process_all_events', return_value=19599999)
+@patch('src.event_subscriber.save_windows')
+@patch('src.event_listener.parse_events', return_value=[{'blockNumber': 19600000}])
+def test_handle_log_saves_formatted_log(mock_parse_events, mock_save_windows, mock_fetch_and_process):
+    """Test that a subscription log is decoded from hex, routed and stored after filling the gap before it."""
+    last_block = handle_log(events_config, raw_log, 19500000)
+
+    mock_fetch_and_process.assert_called_once_with(events_config, 19500001, 19599999)
+
+    event_name, _, logs = mock_parse_events.call_args.args
+    assert event_name == "TotalDistribution"
+    assert logs[0]['blockNumber'] == 19600000
+    assert logs[0]['transactionIndex'] == 0
+    assert last_block == 19599999, "Only the block before the log is complete."
+    mock_save_windows.assert_called_once_with(
+        {"TotalDistribution": [{'blockNumber': 19600000}]}, 19599999)
+
+
+@patch('src.event_subscriber.rollback_events')
+@patch('src.event_subscriber.save_windows')
+def test_handle_log_rolls_back_removed_log(mock_save_windows, mock_rollback_events):
+    """Test that logs removed by a reorg roll back their block instead of being stored."""
+    last_block = handle_log(events_config, dict(raw_log, removed=True), 19650000)
+
+    assert last_block == 19599999
+    mock_rollback_events.assert_called_once_with(events_config, 19599999)
+    mock_save_windows.assert_not_called()
+
+
+@patch('src.event_subscriber.fetch_and_process_all_events', return_value=19599000)
+@patch('src.event_subscriber.save_windows')
+@patch('src.event_listener.parse_events', return_value=[{'blockNumber': 19600000}])
+def test_handle_log_keeps_cursor_before_unfilled_blocks(mock_parse_events, mock_save_windows, mock_fetch_and_process):
+    """Test that the cursor does not move past blocks the gap fill failed to process."""
+    last_block = handle_log(events_config, raw_log, 19500000)
+
+    assert last_block == 19599000
+    mock_save_windows.assert_called_once_with(
+        {"TotalDistribution": [{'blockNumber': 19600000}]}, 19599000)
+
+
+class Stop(BaseException):
+    pass
+
+
+class FakeWebSocket:
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def send(self, message):
+        pass
+
+    async def recv(self):
+        return json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': '0xsub'})
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.messages:
+            raise StopAsyncIteration
+        return self.messages.pop(0)
+
+
+def canonical_hash(block_number):
+    return HexBytes(block_number.to_bytes(32, 'big'))
+
+
+@pytest.mark.asyncio
+@patch('src.event_subscriber.LISTENER_CONFIG', {'reconnect_seconds': 0})
+@patch('src.event_subscriber.load_block_hashes', side_effect=lambda *args: BlockHashWindow(size=10))
+@patch('src.event_subscriber.get_block_hash', side_effect=canonical_hash)
+@patch('src.event_subscriber.handle_log', return_value=19600500)
+@patch('src.event_subscriber.fetch_and_process_all_events', side_effect=[19600100, 19600700])
+@patch('src.event_subscriber.w3')
+async def test_run_subscription_fills_gap_to_head_on_reconnect(mock_w3, mock_fetch_and_process, mock_handle_log,
+                                                               mock_get_block_hash, mock_load_block_hashes):
+    """Test that every (re)connect fills the gap up to the chain head, not only to the confirmed block."""
+    type(mock_w3.eth).block_number = property(MagicMock(side_effect=[19600100, 19600700]))
+    notification = json.dumps({'params': {'subscription': '0xsub', 'result': raw_log}})
+    connections = [FakeWebSocket([notification]), FakeWebSocket([]), Stop()]
+
+    with patch('src.event_subscriber.websockets.connect', side_effect=connections):
+        with pytest.raises(Stop):
+            await run_subscription(19600000, events_config)
+
+    assert [call.args for call in mock_fetch_and_process.call_args_list] == [
+        (events_config, 19600000, 19600100),
+        (events_config, 19600501, 19600700),
+    ]
+    mock_handle_log.assert_called_once_with(events_config, raw_log, 19600100)
+
+
+@pytest.mark.asyncio
+@patch('src.event_subscriber.LISTENER_CONFIG', {'reconnect_seconds': 0})
+@patch('src.event_subscriber.get_block_hash', side_effect=canonical_hash)
+@patch('src.event_subscriber.rollback_events')
+@patch('src.event_subscriber.fetch_and_process_all_events', return_value=19600100)
+@patch('src.event_subscriber.w3')
+async def test_run_subscription_rolls_back_reorg_during_disconnect(mock_w3, mock_fetch_and_process,
+                                                                   mock_rollback_events, mock_get_block_hash):
+    """Test that stored blocks replaced while disconnected are rolled back before the gap fill."""
+    mock_w3.eth.block_number = 19600100
+    block_hashes = BlockHashWindow(size=10)
+    block_hashes.record(19600000, canonical_hash(19600000).hex())
+    block_hashes.record(19600010, '0x' + 'ee' * 32)
+
+    with patch('src.event_subscriber.load_block_hashes', return_value=block_hashes), \
+            patch('src.event_subscriber.websockets.connect', side_effect=[FakeWebSocket([]), Stop()]):
+        with pytest.raises(Stop):
+            await run_subscription(19600011, events_config)
+
+    mock_rollback_events.assert_called_once_with(events_config, 19600000)
+    mock_fetch_and_process.assert_called_once_with(events_config, 19600001, 19600100)
@@ -1,6 +1,7 @@
 import pytest
 from sqlalchemy.exc import IntegrityError
-from src.models import Session, Event
+from unittest.mock import MagicMock
+from src.models import Session, Event, EventRollup, SyncState, ReportState, create_event_partition
 from datetime import datetime, timedelta
 
 @pytest.fixture(scope="module")
@@ -69,4 +70,128 @@ def test_get_last_event_block_number(db_session):
     Event.insert_event(db_session, event_name, test_event_data)
 
     last_block_number = Event.get_last_event_block_number(db_session, event_name)
-    assert last_block_number == 12345678, "Should return the correct last event block number."
\ No newline at end of file
+    assert last_block_number == 12345678, "Should return the correct last event block number."
+
+def test_insert_events_skips_duplicates(db_session):
+    """Test that a page of events is inserted once and duplicates are counted as skipped."""
+    events_data = [{
+        "name": "BulkEvent",
+        "contractName": "AIX",
+        "blockNumber": 2345678,
+        "blockHash": "0x2345",
+        "transactionIndex": index,
+        "transactionHash": f"0xbulk{index}",
+        "data": {"key": "value"},
+        "timestamp": datetime.utcnow(),
+        "logIndex": index,
+        "removed": False
+    } for index in range(3)]
+
+    inserted, skipped = Event.insert_events(db_session, "BulkEvent", events_data)
+    assert (inserted, skipped) == (3, 0), "All new events should be inserted."
+
+    inserted, skipped = Event.insert_events(db_session, "BulkEvent", events_data)
+    assert (inserted, skipped) == (0, 3), "Existing events should be skipped."
+
+
+def test_sync_state_tracks_last_block_number(db_session):
+    """Test that the sync checkpoint is created, moved forward and deleted."""
+    event_name = "SyncedEvent"
+    assert SyncState.get_last_block_number(db_session, event_name) is None
+
+    SyncState.set_last_block_number(db_session, event_name, 100)
+    SyncState.set_last_block_number(db_session, event_name, 200)
+    assert SyncState.get_last_block_number(db_session, event_name) == 200
+
+    SyncState.delete_state(db_session, event_name)
+    assert SyncState.get_last_block_number(db_session, event_name) is None
+
+
+def test_rollup_window_totals_match_events(db_session):
+    """Test that window totals from rollups match totals computed from raw events."""
+    event_name = "RollupEvent"
+    now = datetime.utcnow()
+    for index, minutes_ago in enumerate([5, 70, 300, 1500, 3000, 5000]):
+        Event.insert_event(db_session, event_name, {
+            "name": event_name,
+            "contractName": "AIX",
+            "blockNumber": 3456000 + index,
+            "blockHash": "0x3456",
+            "transactionIndex": 0,
+            "transactionHash": f"0xrollup{index}",
+            "data": {},
+            "aixProcessed": 10 ** 18 + 1,
+            "aixDistributed": 10 ** 18,
+            "ethBought": 5 * 10 ** 17,
+            "ethDistributed": 25 * 10 ** 16,
+            "timestamp": now - timedelta(minutes=minutes_ago),
+            "logIndex": 0,
+            "removed": False
+        })
+
+    for hours in [1, 4, 24, 72]:
+        since = now - timedelta(hours=hours)
+        rollup_totals = EventRollup.get_window_totals(db_session, event_name, since, now)
+        raw_totals = EventRollup.aggregate_raw(
+            db_session, event_name, Event.timestamp >= since, Event.timestamp <= now)
+        assert rollup_totals == raw_totals, f"Totals should match for a {hours}h window."
+    assert rollup_totals['aixProcessed'] == rollup_totals['count'] * (10 ** 18 + 1), "Sums of raw amounts must be exact."
+
+
+def test_rollback_after_block(db_session):
+    """Test that a rollback deletes reorged events, fixes rollups and rewinds the cursor."""
+    event_name = "ReorgEvent"
+    now = datetime.utcnow()
+    for index, block_number in enumerate([4567000, 4567001, 4567002]):
+        Event.insert_event(db_session, event_name, {
+            "name": event_name,
+            "contractName": "AIX",
+            "blockNumber": block_number,
+            "blockHash": f"0x{block_number}",
+            "transactionIndex": 0,
+            "transactionHash": f"0xreorg{index}",
+            "data": {},
+            "aixProcessed": 1,
+            "aixDistributed": 1,
+            "ethBought": 1,
+            "ethDistributed": 1,
+            "timestamp": now - timedelta(minutes=3 - index),
+            "logIndex": 0,
+            "removed": False
+        })
+    SyncState.set_last_block_number(db_session, event_name, 4567002)
+
+    assert Event.rollback_after_block(db_session, event_name, 4567000) == 2
+
+    assert Event.get_last_event_block_number(db_session, event_name) == 4567000
+    assert SyncState.get_last_block_number(db_session, event_name) == 4567000
+    totals = EventRollup.get_window_totals(
+        db_session, event_name, now - timedelta(days=2), now)
+    assert totals['count'] == 1
+
+
+def test_report_state(db_session):
+    """Test that report send times are stored and overwritten."""
+    event_name = "ReportStateEvent"
+    first_sent_at = datetime(2024, 4, 1, 12, 0)
+    ReportState.set_last_sent_at(db_session, event_name, first_sent_at)
+    ReportState.set_last_sent_at(db_session, event_name, first_sent_at + timedelta(hours=4))
+    assert ReportState.get_last_sent_at(db_session, event_name) == first_sent_at + timedelta(hours=4)
+
+
+def test_create_event_partition_moves_default_rows():
+    """Test that a month missing a partition takes its rows from the default partition."""
+    connection = MagicMock()
+    # The month has no partition yet, the default partition exists
+    connection.execute.return_value.scalar.side_effect = [None, 'events_default']
+    connection.execute.return_value.rowcount = 2
+
+    create_event_partition(connection, datetime(2024, 7, 1), datetime(2024, 8, 1))
+
+    statements = [str(call.args[0]) for call in connection.execute.call_args_list[2:]]
+    assert statements[0].startswith("LOCK TABLE events_default")
+    assert statements[1] == "CREATE TABLE events_2024_07 (LIKE events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    assert "DELETE FROM events_default WHERE timestamp >= '2024-07-01' AND timestamp < '2024-08-01'" in statements[2]
+    assert "INSERT INTO events_2024_07" in statements[2]
+    assert statements[3] == ("ALTER TABLE events ATTACH PARTITION events_2024_07 "
+                             "FOR VALUES FROM ('2024-07-01') TO ('2024-08-01')")
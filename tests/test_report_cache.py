@@ -0,0 +1,75 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from src.report_cache import ReportCache
+from src.config import EVENTS_CONFIG
+
+HOURS = EVENTS_CONFIG["TotalDistribution"]["report_interval_hours"]
+
+
+class FakeGenerator:
+    renders = 0
+
+    def __init__(self, event_name, hours=None):
+        self.event_name = event_name
+        self.hours = hours
+
+    def generate_report(self):
+        FakeGenerator.renders += 1
+        time.sleep(0.01)
+        return f"{self.event_name} {self.hours}h #{FakeGenerator.renders}"
+
+
+@pytest.fixture(autouse=True)
+def fake_generator():
+    FakeGenerator.renders = 0
+    with patch('src.report_cache.get_report_generator', FakeGenerator), \
+            patch('src.report_cache.Event.get_last_event_block_number', return_value=100) as mock_latest:
+        yield mock_latest
+
+
+# Test that a report is rendered once per event, window and latest block
+def test_get_report_reuses_render(fake_generator):
+    cache = ReportCache(ttl_seconds=60, max_entries=10, block_check_seconds=60)
+
+    assert cache.get_report("TotalDistribution") == f"TotalDistribution {HOURS}h #1"
+    assert cache.get_report("TotalDistribution", HOURS) == f"TotalDistribution {HOURS}h #1"
+    assert cache.get_report("TotalDistribution", 1) == "TotalDistribution 1h #2"
+    fake_generator.assert_called_once()
+
+
+# Test that a new latest block in the database changes the key
+def test_get_report_rerenders_after_new_events(fake_generator):
+    cache = ReportCache(ttl_seconds=60, max_entries=10, block_check_seconds=0)
+
+    cache.get_report("TotalDistribution")
+    cache.get_report("TotalDistribution")
+    fake_generator.return_value = 101
+    assert cache.get_report("TotalDistribution") == f"TotalDistribution {HOURS}h #2"
+
+
+# Test TTL expiry and least recently used eviction
+def test_report_cache_evicts_entries():
+    cache = ReportCache(ttl_seconds=60, max_entries=2, block_check_seconds=60)
+    cache.store(("a", 1, 1), "A")
+    cache.store(("b", 1, 1), "B")
+    cache.lookup(("a", 1, 1))
+    cache.store(("c", 1, 1), "C")
+
+    assert cache.lookup(("b", 1, 1)) is None
+    assert cache.lookup(("a", 1, 1)) == "A"
+
+    cache.reports[("a", 1, 1)] = ("A", time.monotonic() - 1)
+    assert cache.lookup(("a", 1, 1)) is None
+
+
+# Test that concurrent requests share a single render
+@pytest.mark.asyncio
+async def test_get_report_async_renders_once():
+    cache = ReportCache(ttl_seconds=60, max_entries=10, block_check_seconds=60)
+
+    reports = await asyncio.gather(*(cache.get_report_async("TotalDistribution") for _ in range(5)))
+
+    assert set(reports) == {f"TotalDistribution {HOURS}h #1"}
+    assert FakeGenerator.renders == 1
@@ -23,13 +23,13 @@ def setup_test_data(db_session):
         "transactionIndex": 0,
         "transactionHash": "0xabc",
         "data": {
-            "aix_processed": 1000,
-            "aix_distributed": 500,
-            "eth_bought": 200,
-            "eth_distributed": 150,
             "distributor_wallet": "0x123",
-            "distributor_balance": 2.5
         },
+        "aixProcessed": 1000 * 10 ** 18,
+        "aixDistributed": 500 * 10 ** 18,
+        "ethBought": 200 * 10 ** 18,
+        "ethDistributed": 150 * 10 ** 18,
+        "distributorBalance": 25 * 10 ** 17,
         "timestamp": datetime.utcnow() - timedelta(hours=2),
         "logIndex": 1,
         "removed": False
@@ -47,4 +47,35 @@ def test_generate_report(db_session, setup_test_data):
     assert "ETH distributed: 150.00" in report
     assert "Distributor wallet: 0x123" in report
     assert "Distributor balance: 2.50 ETH" in report
-    logger.info("Report generation test passed successfully.")
\ No newline at end of file
+    logger.info("Report generation test passed successfully.")
+
+def test_get_totals_aggregates_in_database(db_session, setup_test_data):
+    """Test that totals are summed in SQL and the latest distributor is reported."""
+    event_data = {
+        "name": "TotalDistribution",
+        "contractName": "AIX",
+        "blockNumber": 123457,
+        "blockHash": "0x124",
+        "transactionIndex": 0,
+        "transactionHash": "0xabd",
+        "data": {
+            "distributor_wallet": "0x456",
+        },
+        "aixProcessed": 10 * 10 ** 18,
+        "aixDistributed": 5 * 10 ** 18,
+        "ethBought": 2 * 10 ** 18,
+        "ethDistributed": 1 * 10 ** 18,
+        "distributorBalance": 15 * 10 ** 17,
+        "timestamp": datetime.utcnow() - timedelta(hours=1),
+        "logIndex": 1,
+        "removed": False
+    }
+    Event.insert_event(db_session, "TotalDistribution", event_data)
+
+    totals = TotalDistributionReportGenerator("TotalDistribution").get_totals()
+    assert totals.count == 2
+    assert totals.aixProcessed == 1010 * 10 ** 18
+    assert totals.ethDistributed == 151 * 10 ** 18
+    assert totals.last_tx_time > totals.first_tx_time
+    assert totals.distributor_wallet == "0x456"
+    assert totals.distributor_balance == 15 * 10 ** 17
@@ -0,0 +1,55 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch, AsyncMock
+from src.report_scheduler import ReportScheduler
+
+events_config = {
+    "TotalDistribution": {"active": True, "report_interval_hours": 4},
+    "Inactive": {"active": False, "report_interval_hours": 1},
+}
+
+
+@patch('src.report_scheduler.Session')
+@patch('src.report_scheduler.ReportState')
+def test_load_schedules_from_last_sent_time(mock_report_state, mock_session):
+    """Test that reports resume on their interval after a restart."""
+    last_sent_at = datetime(2024, 4, 1, 12, 0)
+    mock_report_state.get_last_sent_at.return_value = last_sent_at
+    scheduler = ReportScheduler(AsyncMock(), events_config)
+
+    scheduler.load()
+
+    assert scheduler.next_run == {"TotalDistribution": last_sent_at + timedelta(hours=4)}
+
+
+@pytest.mark.asyncio
+@patch('src.report_scheduler.Session')
+@patch('src.report_scheduler.ReportState')
+async def test_run_due_sends_and_persists_reports(mock_report_state, mock_session):
+    """Test that a due report is sent once, stored and scheduled for its next interval."""
+    send_report = AsyncMock()
+    scheduler = ReportScheduler(send_report, events_config)
+    now = datetime(2024, 4, 1, 12, 0)
+
+    await scheduler.run_due(now)
+    await scheduler.run_due(now + timedelta(hours=1))
+
+    send_report.assert_awaited_once_with("TotalDistribution", events_config["TotalDistribution"])
+    mock_report_state.set_last_sent_at.assert_called_once_with(
+        mock_session.return_value, "TotalDistribution", now)
+    assert scheduler.next_run["TotalDistribution"] == now + timedelta(hours=4)
+    assert scheduler.seconds_until_next_run(now + timedelta(hours=1)) == 60
+
+
+@pytest.mark.asyncio
+@patch('src.report_scheduler.Session')
+@patch('src.report_scheduler.ReportState')
+async def test_run_due_retries_failed_reports(mock_report_state, mock_session):
+    """Test that a failed report is not stored and is retried after the retry delay."""
+    scheduler = ReportScheduler(AsyncMock(side_effect=RuntimeError("flood")), events_config)
+    now = datetime(2024, 4, 1, 12, 0)
+
+    await scheduler.run_due(now)
+
+    mock_report_state.set_last_sent_at.assert_not_called()
+    assert scheduler.next_run["TotalDistribution"] == now + timedelta(seconds=300)
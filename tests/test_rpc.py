@@ -0,0 +1,122 @@
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.rpc import batch_request, FailoverHTTPProvider, create_async_web3, open_async_session
+
+
+def test_batch_request_orders_results_by_id():
+    """Test that batch results are returned in call order."""
+    w3 = MagicMock()
+    w3.provider.make_batch_request.return_value = [
+        {'jsonrpc': '2.0', 'id': 1, 'result': '0x2'},
+        {'jsonrpc': '2.0', 'id': 0, 'result': '0x1'},
+    ]
+
+    results = batch_request(w3, [('eth_blockNumber', []), ('eth_chainId', [])])
+
+    assert results == ['0x1', '0x2']
+    payload = w3.provider.make_batch_request.call_args.args[0]
+    assert [call['method'] for call in payload] == ['eth_blockNumber', 'eth_chainId']
+
+
+def test_batch_request_raises_on_call_error():
+    """Test that an error in any call of the batch is raised."""
+    w3 = MagicMock()
+    w3.provider.make_batch_request.return_value = [
+        {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32000, 'message': 'header not found'}},
+    ]
+
+    with pytest.raises(ValueError):
+        batch_request(w3, [('eth_getBlockByNumber', ['0x1', False])])
+
+
+def mock_response(status_code=200, body=None, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = body if body is not None else {'jsonrpc': '2.0', 'id': 0, 'result': '0x1'}
+    return response
+
+
+@patch.dict('src.rpc.RPC_CONFIG', {'backoff_seconds': 0.01, 'max_retries': 3})
+def test_provider_fails_over_from_rate_limited_endpoint():
+    """Test that a throttled endpoint is backed off and the next endpoint is used."""
+    provider = FailoverHTTPProvider(['http://primary', 'http://secondary'])
+    provider.session = MagicMock()
+    provider.session.post.side_effect = [
+        mock_response(429, headers={'Retry-After': '60'}),
+        mock_response(),
+        mock_response(),
+    ]
+
+    assert provider.make_request('eth_blockNumber', [])['result'] == '0x1'
+    assert provider.make_request('eth_blockNumber', [])['result'] == '0x1'
+
+    used_endpoints = [call.args[0] for call in provider.session.post.call_args_list]
+    assert used_endpoints == ['http://primary', 'http://secondary', 'http://secondary']
+    assert provider.endpoints[0].score < provider.endpoints[1].score
+
+
+@patch.dict('src.rpc.RPC_CONFIG', {'backoff_seconds': 0.01, 'max_retries': 2})
+def test_provider_retries_rate_limit_errors_with_backoff():
+    """Test that JSON-RPC rate limit errors are retried until the retry budget is spent."""
+    provider = FailoverHTTPProvider(['http://primary'])
+    provider.session = MagicMock()
+    provider.session.post.return_value = mock_response(
+        body={'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32005, 'message': 'Rate limit exceeded'}})
+
+    with pytest.raises(Exception, match='rate limit'):
+        provider.make_request('eth_blockNumber', [])
+    assert provider.session.post.call_count == 3
+
+
+@patch.dict('src.rpc.RPC_CONFIG', {'backoff_seconds': 0.01, 'max_retries': 3})
+def test_provider_fails_over_on_connect_timeout():
+    """Test that an unreachable endpoint fails over instead of being raised as a slow range."""
+    provider = FailoverHTTPProvider(['http://primary', 'http://secondary'])
+    provider.session = MagicMock()
+    response = mock_response()
+    provider.session.post.side_effect = [requests.ConnectTimeout("connect timed out"), response]
+
+    assert provider.make_request('eth_blockNumber', [])['result'] == '0x1'
+    response.json.assert_called_once()
+    used_endpoints = [call.args[0] for call in provider.session.post.call_args_list]
+    assert used_endpoints == ['http://primary', 'http://secondary']
+
+    provider.session.post.side_effect = requests.ReadTimeout("read timed out")
+    with pytest.raises(requests.ReadTimeout):
+        provider.make_request('eth_blockNumber', [])
+
+
+@pytest.mark.asyncio
+@patch.dict('src.rpc.RPC_CONFIG', {'backoff_seconds': 0.01, 'max_retries': 3})
+async def test_async_provider_fails_over_from_rate_limited_endpoint():
+    """Test that the async provider backs off a throttled endpoint and fails over to the next one."""
+    requests_by_endpoint = {'primary': 0, 'secondary': 0}
+
+    def handler(name, status):
+        async def handle(request):
+            requests_by_endpoint[name] += 1
+            body = await request.json()
+            return web.json_response({'jsonrpc': '2.0', 'id': body['id'], 'result': '0x10'}, status=status)
+        return handle
+
+    servers = []
+    for name, status in (('primary', 429), ('secondary', 200)):
+        app = web.Application()
+        app.router.add_post('/', handler(name, status))
+        servers.append(TestServer(app))
+    for server in servers:
+        await server.start_server()
+    try:
+        async_w3 = create_async_web3([str(server.make_url('/')) for server in servers])
+        session = await open_async_session(async_w3)
+        assert await async_w3.eth.block_number == 16
+        await session.close()
+    finally:
+        for server in servers:
+            await server.close()
+
+    assert requests_by_endpoint == {'primary': 1, 'secondary': 1}
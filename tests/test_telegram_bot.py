@@ -8,7 +8,7 @@ from threading import Thread
 from src.logging_config import logger
 import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 bot = Bot(token=TELEGRAM_BOT_TOKEN)
 
@@ -49,4 +49,52 @@ async def test_send_daily_report(mock_events_config, mock_get_report_generator):
     await send_daily_report(mock_bot)
     mock_bot.send_message.assert_called_with(chat_id="test_group_id",
                                              text="Test Report", parse_mode=ParseMode.MARKDOWN)
-    logger.info("Test for send_daily_report passed.")
\ No newline at end of file
+    logger.info("Test for send_daily_report passed.")
+
+@pytest.mark.asyncio
+@patch('send_report_to_telegram.report_cache')
+async def test_stats_command_serves_cached_report(mock_report_cache):
+    """Test that /stats answers from the report cache with the requested window."""
+    from send_report_to_telegram import stats
+    mock_report_cache.get_report_async = AsyncMock(return_value="Test Report")
+    update = MagicMock()
+    update.message.reply_text = AsyncMock()
+    context = MagicMock(args=["totaldistribution", "1d"])
+
+    await stats(update, context)
+
+    mock_report_cache.get_report_async.assert_awaited_once_with("TotalDistribution", 24)
+    update.message.reply_text.assert_awaited_once_with("Test Report", parse_mode=ParseMode.MARKDOWN)
+
+
+@pytest.mark.asyncio
+@patch('send_report_to_telegram.report_cache')
+async def test_stats_command_rejects_invalid_arguments(mock_report_cache):
+    """Test that unknown events and unsupported windows are answered without a report."""
+    from send_report_to_telegram import stats
+    mock_report_cache.get_report_async = AsyncMock()
+    for args in [[], ["Unknown"], ["TotalDistribution", "5h"], ["TotalDistribution", "week"]]:
+        update = MagicMock()
+        update.message.reply_text = AsyncMock()
+        await stats(update, MagicMock(args=args))
+        update.message.reply_text.assert_awaited_once()
+
+    mock_report_cache.get_report_async.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch('send_report_to_telegram.report_cache')
+async def test_send_event_report_raises_when_no_group_was_reached(mock_report_cache):
+    """Test that a report that reached no group fails, so the scheduler retries it."""
+    from send_report_to_telegram import send_event_report
+    mock_report_cache.get_report_async = AsyncMock(return_value="Test Report")
+    delivery_queue = MagicMock()
+    delivery_queue.broadcast = AsyncMock(return_value=[1, 2])
+    event_config = {"telegram_group_ids": [1, 2]}
+
+    with pytest.raises(RuntimeError):
+        await send_event_report(MagicMock(), "TotalDistribution", event_config, delivery_queue)
+
+    # A report that reached some of the groups is not resent
+    delivery_queue.broadcast.return_value = [2]
+    await send_event_report(MagicMock(), "TotalDistribution", event_config, delivery_queue)
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from telegram.error import RetryAfter, Forbidden, TimedOut
+from src.telegram_delivery import TelegramDeliveryQueue, DeliveryRateLimiter
+
+
+def make_queue(send_message, workers=4, messages_per_second=1000, chat_interval_seconds=0.001):
+    bot = AsyncMock()
+    bot.send_message.side_effect = send_message
+    rate_limiter = DeliveryRateLimiter(messages_per_second, chat_interval_seconds)
+    return bot, TelegramDeliveryQueue(bot, workers=workers, rate_limiter=rate_limiter,
+                                      max_retries=2, backoff_seconds=0.01)
+
+
+# Test that messages to different chats are sent concurrently
+@pytest.mark.asyncio
+async def test_broadcast_sends_concurrently():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def send_message(chat_id, text, **kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+
+    bot, delivery_queue = make_queue(send_message)
+    async with delivery_queue:
+        failed = await delivery_queue.broadcast([1, 2, 3, 4], "Report", parse_mode="Markdown")
+
+    assert failed == []
+    assert max_in_flight == 4
+    bot.send_message.assert_any_await(chat_id=3, text="Report", parse_mode="Markdown")
+
+
+# Test that flood limited and timed out chats are retried without blocking the others
+@pytest.mark.asyncio
+async def test_broadcast_retries_failed_chats():
+    errors = {1: [RetryAfter(0)], 2: [TimedOut(), TimedOut()]}
+    sent = []
+
+    async def send_message(chat_id, text, **kwargs):
+        if errors.get(chat_id):
+            raise errors[chat_id].pop(0)
+        sent.append(chat_id)
+
+    bot, delivery_queue = make_queue(send_message)
+    async with delivery_queue:
+        failed = await delivery_queue.broadcast([1, 2, 3], "Report")
+
+    assert failed == []
+    assert sorted(sent) == [1, 2, 3]
+    assert bot.send_message.await_count == 6
+
+
+# Test that rejected chats are reported without retrying
+@pytest.mark.asyncio
+async def test_broadcast_gives_up_on_rejected_chats():
+    async def send_message(chat_id, text, **kwargs):
+        if chat_id == 1:
+            raise Forbidden("bot was kicked from the group chat")
+        if chat_id == 2:
+            raise TimedOut()
+
+    bot, delivery_queue = make_queue(send_message)
+    async with delivery_queue:
+        failed = await delivery_queue.broadcast([1, 2, 3], "Report")
+
+    assert sorted(failed) == [1, 2]
+    # Chat 1 once, chat 2 with two retries and chat 3 once
+    assert bot.send_message.await_count == 5
+
+
+# Test that the rate limiter spaces messages globally and per chat
+def test_rate_limiter_spaces_messages():
+    rate_limiter = DeliveryRateLimiter(messages_per_second=10, chat_interval_seconds=3)
+
+    assert rate_limiter.reserve("a", now=100) == 0
+    assert rate_limiter.reserve("b", now=100) == pytest.approx(0.1)
+    assert rate_limiter.reserve("a", now=100) == pytest.approx(3)
+    rate_limiter.pause("b", 10, now=100)
+    assert rate_limiter.reserve("b", now=100) == pytest.approx(10)
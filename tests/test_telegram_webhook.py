@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from telegram import Bot
+from aiohttp.test_utils import TestClient, TestServer
+from src.telegram_webhook import create_webhook_app, SECRET_TOKEN_HEADER
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 7,
+        "date": 1700000000,
+        "chat": {"id": -100, "type": "group", "title": "AIX"},
+        "text": "/stats TotalDistribution",
+    },
+}
+
+
+@pytest.fixture
+def application():
+    application = MagicMock()
+    application.update_queue = asyncio.Queue()
+    application.bot = Bot(token="1:test")
+    return application
+
+
+# Test that a webhook update is queued for the application
+@pytest.mark.asyncio
+async def test_webhook_queues_updates(application):
+    async with TestClient(TestServer(create_webhook_app(application, "/telegram", "secret"))) as client:
+        response = await client.post("/telegram", json=UPDATE, headers={SECRET_TOKEN_HEADER: "secret"})
+
+    assert response.status == 200
+    update = application.update_queue.get_nowait()
+    assert update.update_id == 1
+    assert update.message.text == "/stats TotalDistribution"
+
+
+# Test that requests without the secret token or with invalid bodies are rejected
+@pytest.mark.asyncio
+async def test_webhook_rejects_invalid_requests(application):
+    async with TestClient(TestServer(create_webhook_app(application, "/telegram", "secret"))) as client:
+        forbidden = await client.post("/telegram", json=UPDATE, headers={SECRET_TOKEN_HEADER: "wrong"})
+        invalid = await client.post("/telegram", data="not json", headers={SECRET_TOKEN_HEADER: "secret"})
+
+    assert forbidden.status == 403
+    assert invalid.status == 400
+    assert application.update_queue.empty()